@@ -2,13 +2,18 @@ import React from 'react';
 import { Card, Button } from 'react-bootstrap';
 
 const Screenshot = ({ screenshot, onDelete, displayOnly }) => {
+  const url = `http://localhost:5000/api/screenshots/${screenshot.filename}`;
   return (
     <Card className="mb-3">
-      <Card.Img 
-        variant="top" 
-        src={`http://localhost:5000/api/screenshots/${screenshot.filename}`} 
-        alt="Trade Screenshot" 
-      />
+      {/* Small preview; the full-size original opens on click */}
+      <a href={url} target="_blank" rel="noopener noreferrer">
+        <Card.Img 
+          variant="top" 
+          src={`${url}?size=thumb`} 
+          loading="lazy"
+          alt="Trade Screenshot" 
+        />
+      </a>
       {!displayOnly && (
         <Card.Body className="p-2">
           <Button 
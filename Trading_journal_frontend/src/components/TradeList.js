@@ -100,8 +100,8 @@ const TradeList = ({ trades = [], onDelete }) => {
                   {trade.profit_loss}
                 </Badge>
               </td>
-              <td>{trade.risk}</td>
-              <td>{trade.reward}</td>
+              <td>{trade.risk} {trade.risk_currency}</td>
+              <td>{trade.reward} {trade.risk_currency}</td>
               <td>
                 <Link to={`/trade/${trade.id}`} className="btn btn-sm btn-info me-2">
                   View
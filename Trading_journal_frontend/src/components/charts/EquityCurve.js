@@ -1,43 +1,54 @@
-import React, { useMemo } from 'react';
+import React, { useState, useEffect } from 'react';
 import { Line } from 'react-chartjs-2';
-import { Card } from 'react-bootstrap';
-import { formatDate } from '../../utils/helpers'; // Import the helper function
+import { Card, Form, Row, Col, Spinner } from 'react-bootstrap';
+import TradeService from '../../services/api';
 
-const EquityCurve = ({ trades }) => {
-  const chartData = useMemo(() => {
-    if (!trades || trades.length === 0) {
-      return { labels: [], datasets: [] };
-    }
+// Equity and drawdown per day/week/month, computed by the server from the
+// whole filtered history (GET /api/analytics/timeseries)
+const EquityCurve = ({ instrument, startDate, endDate }) => {
+  const [bucket, setBucket] = useState('day');
+  const [series, setSeries] = useState(null);
+  const [loading, setLoading] = useState(true);
 
-    // Sort trades by date ascending
-    const sortedTrades = [...trades].sort((a, b) => 
-      new Date(a.entry_date) - new Date(b.entry_date)
-    );
+  useEffect(() => {
+    const params = { bucket };
+    if (instrument && instrument !== 'all') params.instrument = instrument;
+    if (startDate) params.start_date = startDate;
+    if (endDate) params.end_date = endDate;
 
-    let cumulativeProfit = 0;
-    const data = sortedTrades.map(trade => {
-      cumulativeProfit += parseFloat(trade.profit_loss);
-      return cumulativeProfit;
-    });
+    setLoading(true);
+    TradeService.getAnalytics('timeseries', params)
+      .then(setSeries)
+      .catch(() => setSeries(null))
+      .finally(() => setLoading(false));
+  }, [bucket, instrument, startDate, endDate]);
 
-    // Use formatDate helper instead of toLocaleDateString
-    const labels = sortedTrades.map(trade => formatDate(trade.entry_date));
+  const summary = series ? series.summary : null;
+  const finalEquity = summary ? summary.equity : 0;
 
-    return {
-      labels,
-      datasets: [
-        {
-          label: 'Equity Curve',
-          data,
-          fill: false,
-          borderColor: cumulativeProfit >= 0 ? 'rgba(75, 192, 192, 1)' : 'rgba(255, 99, 132, 1)',
-          tension: 0.1,
-          pointRadius: 2,
-          pointHoverRadius: 5
-        }
-      ]
-    };
-  }, [trades]);
+  const chartData = series ? {
+    labels: series.periods,
+    datasets: [
+      {
+        label: 'Equity Curve',
+        data: series.equity,
+        fill: false,
+        borderColor: finalEquity >= 0 ? 'rgba(75, 192, 192, 1)' : 'rgba(255, 99, 132, 1)',
+        tension: 0.1,
+        pointRadius: 2,
+        pointHoverRadius: 5
+      },
+      {
+        label: 'Drawdown',
+        data: series.drawdown,
+        fill: true,
+        borderColor: 'rgba(255, 99, 132, 0.6)',
+        backgroundColor: 'rgba(255, 99, 132, 0.15)',
+        tension: 0.1,
+        pointRadius: 0
+      }
+    ]
+  } : { labels: [], datasets: [] };
 
   const chartOptions = {
     responsive: true,
@@ -49,10 +60,10 @@ const EquityCurve = ({ trades }) => {
       tooltip: {
         callbacks: {
           title: function(tooltipItems) {
-            return `Date: ${tooltipItems[0].label}`;
+            return `Period: ${tooltipItems[0].label}`;
           },
           label: function(context) {
-            return `Balance: ${context.raw.toFixed(2)}`;
+            return `${context.dataset.label}: ${context.raw.toFixed(2)}`;
           }
         }
       }
@@ -77,27 +88,39 @@ const EquityCurve = ({ trades }) => {
     }
   };
 
-  if (!trades || trades.length === 0) {
-    return (
-      <Card className="p-3">
-        <Card.Body>
-          <Card.Title>Equity Curve</Card.Title>
-          <div className="text-center p-5">No trade data available</div>
-        </Card.Body>
-      </Card>
-    );
-  }
-
   return (
     <Card className="p-3">
       <Card.Body>
-        <Card.Title>Equity Curve</Card.Title>
-        <div style={{ height: '400px' }}>
-          <Line data={chartData} options={chartOptions} />
-        </div>
+        <Row className="align-items-center mb-2">
+          <Col><Card.Title>Equity Curve</Card.Title></Col>
+          <Col xs="auto">
+            <Form.Select size="sm" value={bucket} onChange={(e) => setBucket(e.target.value)}>
+              <option value="day">Daily</option>
+              <option value="week">Weekly</option>
+              <option value="month">Monthly</option>
+            </Form.Select>
+          </Col>
+        </Row>
+        {loading ? (
+          <div className="text-center p-5"><Spinner animation="border" /></div>
+        ) : !summary || summary.total_trades === 0 ? (
+          <div className="text-center p-5">No trade data available</div>
+        ) : (
+          <>
+            <div style={{ height: '400px' }}>
+              <Line data={chartData} options={chartOptions} />
+            </div>
+            <Row className="text-center mt-3">
+              <Col><small>Max drawdown</small><h5>{summary.max_drawdown.toFixed(2)}</h5></Col>
+              <Col><small>Expectancy</small><h5>{summary.expectancy.toFixed(2)}</h5></Col>
+              <Col><small>Longest win / loss streak</small><h5>{summary.max_win_streak} / {summary.max_loss_streak}</h5></Col>
+              <Col><small>Sharpe</small><h5>{summary.sharpe === null ? '-' : summary.sharpe.toFixed(2)}</h5></Col>
+            </Row>
+          </>
+        )}
       </Card.Body>
     </Card>
   );
 };
 
-export default EquityCurve;
\ No newline at end of file
+export default EquityCurve;
@@ -20,8 +20,11 @@ const AddTrade = () => {
     size: 1,
     risk: 0,
     reward: 0,
+    risk_currency: '',
     profit_loss: 0,
     duration: '',
+    open_time: '',
+    close_time: '',
     //strategy: '',
     //setup: '',
     //mistakes: '',
@@ -41,8 +44,11 @@ const AddTrade = () => {
     size: trade.size !== undefined ? Number(trade.size) : formValues.size || 0,
     profit_loss: trade.profit_loss !== undefined ? Number(trade.profit_loss) : formValues.profit_loss || 0,
     duration: trade.duration || formValues.duration || '',
+    open_time: trade.open_time || '',
+    close_time: trade.close_time || '',
     risk: trade.risk !== undefined ? Number(trade.risk) : formValues.risk || 0,
     reward: trade.reward !== undefined ? Number(trade.reward) : formValues.reward || 0,
+    risk_currency: trade.risk_currency || '',
       // Keep other fields unchanged
       //strategy: formValues.strategy,
       //setup: formValues.setup,
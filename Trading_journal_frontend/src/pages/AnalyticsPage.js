@@ -81,7 +81,7 @@ const AnalyticsPage = () => {
     
     switch(selectedChart) {
       case 'equityCurve':
-        return <EquityCurve trades={filteredTrades} />;
+        return <EquityCurve instrument={selectedInstrument} startDate={dateRange.startDate} endDate={dateRange.endDate} />;
       case 'profitByInstrument':
         return <ProfitByInstrument trades={filteredTrades} />;
       case 'winLossDistribution':
@@ -26,9 +26,12 @@ const Dashboard = () => {
   const fetchTrades = async () => {
     try {
       setLoading(true);
-      const data = await TradeService.getAllTrades();
+      const [data, summary] = await Promise.all([
+        TradeService.getAllTrades(),
+        TradeService.getAnalytics('summary')
+      ]);
       setTrades(data);
-      calculateStats(data);
+      setStats(toStats(summary));
       setError(null);
     } catch (err) {
       setError('Failed to fetch trades. Please try again later.');
@@ -37,32 +40,22 @@ const Dashboard = () => {
     }
   };
 
-  const calculateStats = (tradeData) => {
-    if (!tradeData.length) return;
-
-    const winningTrades = tradeData.filter(t => t.profit_loss > 0);
-    const losingTrades = tradeData.filter(t => t.profit_loss < 0);
-    const totalProfit = tradeData.reduce((sum, t) => sum + t.profit_loss, 0);
-    
-    const avgProfit = winningTrades.length 
-      ? winningTrades.reduce((sum, t) => sum + t.profit_loss, 0) / winningTrades.length 
-      : 0;
-      
-    const avgLoss = losingTrades.length 
-      ? losingTrades.reduce((sum, t) => sum + t.profit_loss, 0) / losingTrades.length 
-      : 0;
+  // Stats come precomputed from the server's rollup tables
+  const toStats = (summary) => ({
+    totalTrades: summary.total_trades,
+    winningTrades: summary.winning_trades,
+    losingTrades: summary.losing_trades,
+    winRate: summary.win_rate,
+    averageProfit: summary.average_profit,
+    averageLoss: summary.average_loss,
+    biggestWin: summary.biggest_win,
+    biggestLoss: summary.biggest_loss,
+    totalProfit: summary.total_profit
+  });
 
-    setStats({
-      totalTrades: tradeData.length,
-      winningTrades: winningTrades.length,
-      losingTrades: losingTrades.length,
-      winRate: tradeData.length ? (winningTrades.length / tradeData.length) * 100 : 0,
-      averageProfit: avgProfit,
-      averageLoss: avgLoss,
-      biggestWin: Math.max(...tradeData.map(t => t.profit_loss), 0),
-      biggestLoss: Math.min(...tradeData.map(t => t.profit_loss), 0),
-      totalProfit
-    });
+  const refreshStats = async () => {
+    const summary = await TradeService.getAnalytics('summary');
+    setStats(toStats(summary));
   };
 
   const handleDelete = async (id) => {
@@ -70,7 +63,7 @@ const Dashboard = () => {
       try {
         await TradeService.deleteTrade(id);
         setTrades(trades.filter(trade => trade.id !== id));
-        calculateStats(trades.filter(trade => trade.id !== id));
+        await refreshStats();
       } catch (err) {
         setError('Failed to delete trade.');
       }
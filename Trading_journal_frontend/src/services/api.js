@@ -13,6 +13,71 @@ const TradeService = {
     }
   },
 
+  // Trades as lists per field: { count, columns: { id: [...], timestamp: [...], ... } }
+  getTradeColumns: async (params = {}) => {
+    try {
+      const response = await axios.get(`${API_URL}/trades`, { params: { ...params, format: 'columns' } });
+      return response.data;
+    } catch (error) {
+      console.error("Error fetching trade columns:", error);
+      throw error;
+    }
+  },
+
+  // Trade changes after a cursor: { changes: [{op: 'upsert', trade} | {op: 'delete', id}],
+  // cursor, has_more }. Without since only the current cursor is returned.
+  // A 410 means the cursor is too old and all trades must be reloaded.
+  getChanges: async (since, params = {}) => {
+    try {
+      const query = since === undefined ? params : { ...params, since };
+      const response = await axios.get(`${API_URL}/changes`, { params: query });
+      return response.data;
+    } catch (error) {
+      console.error("Error fetching changes:", error);
+      throw error;
+    }
+  },
+
+  // Push the same changes as they happen; returns the EventSource (call close())
+  subscribeChanges: (since, onChanges, onReset) => {
+    // Without a cursor the server starts from the latest change
+    const query = since === undefined || since === null ? '' : `?since=${since}`;
+    const source = new EventSource(`${API_URL}/changes/stream${query}`);
+    source.addEventListener('changes', (event) => onChanges(JSON.parse(event.data), Number(event.lastEventId)));
+    source.addEventListener('reset', () => {
+      source.close();
+      if (onReset) onReset();
+    });
+    return source;
+  },
+
+  // Full-text search over trade comments; results are best match first and
+  // carry rank and an HTML snippet with the matches in <mark>
+  searchTrades: async (q, params = {}) => {
+    try {
+      const response = await axios.get(`${API_URL}/trades/search`, { params: { ...params, q } });
+      return response.data;
+    } catch (error) {
+      console.error("Error searching trades:", error);
+      throw error;
+    }
+  },
+
+  // Fetch one page of trades; params may hold limit, cursor and the filters
+  // (instrument, direction, start_date, end_date, outcome)
+  getTradesPage: async (params = {}) => {
+    try {
+      const response = await axios.get(`${API_URL}/trades`, { params });
+      return {
+        trades: response.data,
+        nextCursor: response.headers['x-next-cursor'] || null
+      };
+    } catch (error) {
+      console.error("Error fetching trades page:", error);
+      throw error;
+    }
+  },
+
   getTrade: async (id) => {
     try {
       const response = await axios.get(`${API_URL}/trades/${id}`);
@@ -96,6 +161,16 @@ const TradeService = {
       throw error;
     }
   },
+
+  deleteTrades: async (ids) => {
+    try {
+      const response = await axios.post(`${API_URL}/trades/bulk-delete`, { ids });
+      return response.data;
+    } catch (error) {
+      console.error('Error deleting trades:', error);
+      throw error;
+    }
+  },
   uploadScreenshot: async (tradeId, file) => {
     try {
       // Create FormData for file upload
@@ -126,8 +201,44 @@ const TradeService = {
     }
   },
 
+  // Server-side chart series, e.g. getAnalytics('equity-curve', { instrument: 'US100' })
+  getAnalytics: async (series, params = {}) => {
+    try {
+      const response = await axios.get(`${API_URL}/analytics/${series}`, { params });
+      return response.data;
+    } catch (error) {
+      console.error(`Error fetching analytics ${series}:`, error);
+      throw error;
+    }
+  },
+
   downloadExcel: () => {
     window.open(`${API_URL}/export/excel`, '_blank');
+  },
+
+  // Background exports: format is xlsx, csv, parquet or feather
+  submitExportJob: async (format, filters = {}) => {
+    try {
+      const response = await axios.post(`${API_URL}/export/jobs`, { format, filters });
+      return response.data;
+    } catch (error) {
+      console.error("Error submitting export:", error);
+      throw error;
+    }
+  },
+
+  getExportJob: async (jobId) => {
+    try {
+      const response = await axios.get(`${API_URL}/export/jobs/${jobId}`);
+      return response.data;
+    } catch (error) {
+      console.error(`Error fetching export ${jobId}:`, error);
+      throw error;
+    }
+  },
+
+  downloadExportJob: (jobId) => {
+    window.open(`${API_URL}/export/jobs/${jobId}/download`, '_blank');
   }
 };
 
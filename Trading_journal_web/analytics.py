@@ -0,0 +1,334 @@
+from flask import request, jsonify
+from sqlalchemy import select, func, case
+from models import db, Trade, DailyStats, InstrumentStats
+from queries import trade_filters, FILTER_ARGS
+from response_cache import versioned
+import columnar
+from datetime import date
+import math
+import re
+
+
+# Risk/reward buckets used by the R:R chart: (label, lower bound, upper bound)
+RR_BUCKETS = [
+    ('<0.5', 0, 0.5),
+    ('0.5-1', 0.5, 1),
+    ('1', 1, 1),
+    ('1-2', 1, 2),
+    ('2-3', 2, 3),
+    ('3+', 3, math.inf),
+]
+
+TIMEFRAMES = ('daily', 'weekly', 'monthly')
+
+# Bare dates, which trade_filters reads as whole days
+_DATE_RE = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+
+def _pl():
+    return func.coalesce(Trade.profit_loss, 0.0)
+
+
+def _columns(criteria, *columns, order_by=None):
+    """Fetch the given columns for the filtered trades as a list of tuples per column"""
+    stmt = select(*columns).where(*criteria)
+    if order_by is not None:
+        stmt = stmt.order_by(*order_by)
+    rows = db.session.execute(stmt).all()
+    if not rows:
+        return [() for _ in columns]
+    return list(zip(*rows))
+
+
+def _summary(total, wins, losses, total_profit, gross_profit, gross_loss, best, worst):
+    total = total or 0
+    wins = wins or 0
+    losses = losses or 0
+    total_profit = total_profit or 0.0
+    return {
+        'total_trades': total,
+        'winning_trades': wins,
+        'losing_trades': losses,
+        'breakeven_trades': total - wins - losses,
+        'win_rate': wins / total * 100 if total else 0.0,
+        'total_profit': total_profit,
+        'average_pl': total_profit / total if total else 0.0,
+        'average_profit': (gross_profit or 0.0) / wins if wins else 0.0,
+        'average_loss': (gross_loss or 0.0) / losses if losses else 0.0,
+        'biggest_win': max(best or 0.0, 0.0),
+        'biggest_loss': min(worst or 0.0, 0.0),
+    }
+
+
+def _extremes(criteria):
+    # Unfiltered this is two lookups on ix_trade_profit_loss
+    return db.session.execute(
+        select(func.max(Trade.profit_loss), func.min(Trade.profit_loss)).where(*criteria)
+    ).one()
+
+
+def summary(criteria):
+    """Headline statistics in a single aggregate query"""
+    pl = _pl()
+    row = db.session.execute(
+        select(
+            func.count(Trade.id),
+            func.sum(case((pl > 0, 1), else_=0)),
+            func.sum(case((pl < 0, 1), else_=0)),
+            func.sum(pl),
+            func.sum(case((pl > 0, pl), else_=0.0)),
+            func.sum(case((pl < 0, pl), else_=0.0)),
+            func.max(pl),
+            func.min(pl),
+        ).where(*criteria)
+    ).one()
+    return _summary(*row)
+
+
+def rollup_summary(args, criteria):
+    """Summary read from the rollup tables, or None if the filters need the raw trades.
+
+    Instrument/direction filters are answered from InstrumentStats and whole-day
+    date ranges from DailyStats; anything else falls back to summary().
+    """
+    # Only the trade filters matter (?format= and the like don't)
+    filters = {key for key in FILTER_ARGS if args.get(key)}
+    if not filters <= {'instrument', 'direction', 'start_date', 'end_date'}:
+        return None
+
+    by_instrument = filters & {'instrument', 'direction'}
+    by_date = filters & {'start_date', 'end_date'}
+    if by_instrument and by_date:
+        return None
+
+    if by_date:
+        values = [args[key].strip() if key in by_date else None for key in ('start_date', 'end_date')]
+        if not all(_DATE_RE.fullmatch(value) for value in values if value):
+            return None
+        try:
+            bounds = [date.fromisoformat(value) if value else None for value in values]
+        except ValueError:
+            return None
+        model = DailyStats
+        conditions = []
+        if bounds[0]:
+            conditions.append(DailyStats.date >= bounds[0])
+        if bounds[1]:
+            conditions.append(DailyStats.date <= bounds[1])
+    else:
+        model = InstrumentStats
+        conditions = []
+        instruments = [v.strip() for raw in args.getlist('instrument') for v in raw.split(',') if v.strip()]
+        if instruments:
+            conditions.append(InstrumentStats.instrument.in_(instruments))
+        if 'direction' in filters:
+            conditions.append(InstrumentStats.direction == args['direction'].strip().lower())
+
+    totals = db.session.execute(
+        select(
+            func.sum(model.trade_count),
+            func.sum(model.win_count),
+            func.sum(model.loss_count),
+            func.sum(model.total_profit),
+            func.sum(model.gross_profit),
+            func.sum(model.gross_loss),
+        ).where(*conditions)
+    ).one()
+    return _summary(*totals, *_extremes(criteria))
+
+
+def equity_curve(criteria):
+    """Cumulative P/L in trade order"""
+    import numpy as np
+
+    timestamps, profits = _columns(
+        criteria, Trade.timestamp, _pl(), order_by=(Trade.timestamp, Trade.id)
+    )
+    equity = np.cumsum(np.asarray(profits, dtype=float))
+    return {
+        'timestamps': [t.isoformat() for t in timestamps],
+        'equity': equity.tolist(),
+    }
+
+
+def profit_by_instrument(criteria):
+    total = func.sum(_pl())
+    rows = db.session.execute(
+        select(Trade.instrument, total, func.count(Trade.id))
+        .where(*criteria)
+        .group_by(Trade.instrument)
+        .order_by(total.desc())
+    ).all()
+    return {
+        'instruments': [instrument or 'Unknown' for instrument, _, _ in rows],
+        'total_profit': [profit for _, profit, _ in rows],
+        'counts': [count for _, _, count in rows],
+    }
+
+
+def win_loss(criteria, stats=None):
+    stats = stats or summary(criteria)
+    return {
+        'wins': stats['winning_trades'],
+        'losses': stats['losing_trades'],
+        'break_even': stats['breakeven_trades'],
+        'total_trades': stats['total_trades'],
+        'win_rate': stats['win_rate'],
+    }
+
+
+def direction_bias(criteria):
+    pl = _pl()
+    side = case(
+        (func.lower(Trade.direction).in_(['long', 'buy']), 'long'),
+        (func.lower(Trade.direction).in_(['short', 'sell']), 'short'),
+    )
+    rows = db.session.execute(
+        select(side, func.count(Trade.id), func.sum(pl), func.sum(case((pl > 0, 1), else_=0)))
+        .where(*criteria)
+        .group_by(side)
+    ).all()
+    result = {d: {'count': 0, 'profit': 0.0, 'win_rate': 0.0, 'avg_profit': 0.0} for d in ('long', 'short')}
+    for direction, count, profit, wins in rows:
+        if direction not in result:
+            continue
+        result[direction] = {
+            'count': count,
+            'profit': profit or 0.0,
+            'win_rate': wins / count * 100 if count else 0.0,
+            'avg_profit': (profit or 0.0) / count if count else 0.0,
+        }
+    return result
+
+
+def _rr_bucket(ratio):
+    """CASE expression labelling a reward/risk ratio with its RR_BUCKETS label"""
+    # Buckets are tested in order, so each only needs its upper bound
+    whens = [(ratio < RR_BUCKETS[0][1], None)]
+    for label, low, high in RR_BUCKETS:
+        if low == high:
+            whens.append((ratio == low, label))
+        elif high == math.inf:
+            whens.append((ratio >= low, label))
+        else:
+            whens.append((ratio < high, label))
+    return case(*whens)
+
+
+def risk_reward(criteria):
+    """Trade counts and P/L per reward/risk ratio bucket (trades with positive risk only)"""
+    bucket = _rr_bucket(Trade.reward / Trade.risk)
+    rows = db.session.execute(
+        select(bucket, func.count(Trade.id), func.sum(_pl()))
+        .where(*criteria, Trade.risk > 0, Trade.reward.isnot(None))
+        .group_by(bucket)
+    ).all()
+    totals = {label: (count, profit) for label, count, profit in rows}
+
+    labels = [label for label, _, _ in RR_BUCKETS]
+    return {
+        'labels': labels,
+        'counts': [totals.get(label, (0, 0.0))[0] for label in labels],
+        'total_profit': [totals.get(label, (0, 0.0))[1] or 0.0 for label in labels],
+    }
+
+
+def duration_columns(criteria):
+    """Duration and P/L per trade as lists per field, from the typed duration_seconds column"""
+    import numpy as np
+
+    ids, instruments, directions, seconds, profits = _columns(
+        [*criteria, Trade.duration_seconds.isnot(None)],
+        Trade.id, Trade.instrument, Trade.direction, Trade.duration_seconds, _pl(),
+    )
+    return {
+        'id': list(ids),
+        'instrument': list(instruments),
+        'direction': list(directions),
+        'duration_hours': (np.asarray(seconds, dtype=float) / 3600).tolist(),
+        'profit_loss': list(profits),
+    }
+
+
+def duration_vs_profit(criteria):
+    columns = duration_columns(criteria)
+    return {'points': [dict(zip(columns, values)) for values in zip(*columns.values())]}
+
+
+def period_starts(timestamps, timeframe):
+    import numpy as np
+
+    days = np.asarray(timestamps, dtype='datetime64[us]').astype('datetime64[D]')
+    if timeframe == 'daily':
+        return days
+    if timeframe == 'weekly':
+        # Weeks start on Sunday; 1970-01-01 (day 0) was a Thursday
+        day_numbers = days.astype(np.int64)
+        return (day_numbers - (day_numbers + 4) % 7).astype('datetime64[D]')
+    return days.astype('datetime64[M]')
+
+
+def trades_over_time(criteria, timeframe='daily'):
+    import numpy as np
+
+    if timeframe not in TIMEFRAMES:
+        raise ValueError(f"Invalid timeframe: {timeframe}")
+    timestamps, profits = _columns(criteria, Trade.timestamp, _pl())
+    if not timestamps:
+        return {'periods': [], 'counts': [], 'profit': []}
+
+    periods, inverse = np.unique(period_starts(timestamps, timeframe), return_inverse=True)
+    counts = np.bincount(inverse)
+    profit = np.bincount(inverse, weights=np.asarray(profits, dtype=float))
+    return {
+        'periods': [str(p) for p in periods],
+        'counts': counts.tolist(),
+        'profit': profit.tolist(),
+    }
+
+
+ANALYTICS = {
+    'summary': summary,
+    'equity-curve': equity_curve,
+    'profit-by-instrument': profit_by_instrument,
+    'win-loss': win_loss,
+    'direction-bias': direction_bias,
+    'risk-reward': risk_reward,
+    'duration-vs-profit': duration_vs_profit,
+}
+
+
+def analytics_series(name, args, criteria):
+    """The named series for the filtered trades, or None for an unknown name"""
+    if name in ('summary', 'win-loss'):
+        stats = rollup_summary(args, criteria)
+        if stats is not None:
+            return stats if name == 'summary' else win_loss(criteria, stats)
+    if name == 'trades-over-time':
+        return trades_over_time(criteria, args.get('timeframe', 'daily'))
+    if name not in ANALYTICS:
+        return None
+    return ANALYTICS[name](criteria)
+
+
+def register_analytics_routes(app):
+    # Server-side chart series; all endpoints accept the /api/trades filters.
+    # Tabular series are also sent as columns (?format=columns|arrow or the
+    # matching Accept type); summaries stay JSON objects.
+    @app.route('/api/analytics/<name>', methods=['GET'])
+    @versioned
+    def get_analytics(name):
+        try:
+            criteria = trade_filters(request.args)
+            fmt = columnar.wants_columns()
+            if fmt and name == 'duration-vs-profit':
+                return columnar.columns_response(duration_columns(criteria), fmt)
+            result = analytics_series(name, request.args, criteria)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        if result is None:
+            return jsonify({'error': f'Unknown analytics series: {name}'}), 404
+        if fmt and columnar.is_tabular(result):
+            return columnar.columns_response(result, fmt)
+        return jsonify(result)
@@ -1,39 +1,73 @@
 from flask import Flask
-from models import db
+from database import init_database
 import os
 from routes import register_routes
+from analytics import register_analytics_routes
+from export_jobs import register_export_job_routes
+from changes import register_change_routes
+from timeseries import register_timeseries_routes
+from commands import register_commands
+from thumbnails import init_thumbnails
+from storage import init_storage
+from response_cache import init_response_cache
+from metrics import init_metrics
 from flask_cors import CORS
 
 
 def create_app():
     app = Flask(__name__)
-    CORS(app)
+    CORS(app, expose_headers=['X-Next-Cursor'])
     # Configuration
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev_key')
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///trades.db'
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['UPLOAD_FOLDER'] = os.path.join('static', 'uploads')
+    app.config['EXPORT_WORKERS'] = int(os.environ.get('EXPORT_WORKERS', 2))
+    # Queued/running export jobs without a heartbeat for this long count as dead
+    app.config['EXPORT_STALE_SECONDS'] = int(os.environ.get('EXPORT_STALE_SECONDS', 900))
+    app.config['THUMBNAIL_WORKERS'] = int(os.environ.get('THUMBNAIL_WORKERS', 2))
+    app.config['RESPONSE_CACHE_BYTES'] = int(os.environ.get('RESPONSE_CACHE_BYTES', 32 * 1024 * 1024))
+    # Log SQL statements slower than this; ?profile=1 only works when enabled
+    app.config['SLOW_QUERY_MS'] = int(os.environ.get('SLOW_QUERY_MS', 200))
+    app.config['PROFILE_REQUESTS'] = os.environ.get('PROFILE_REQUESTS') == '1'
+    # Let a front proxy send screenshot bytes: X-Sendfile (Apache/lighttpd)
+    # or an nginx internal location prefix for X-Accel-Redirect
+    app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE') == '1'
+    app.config['SCREENSHOT_ACCEL_REDIRECT'] = os.environ.get('SCREENSHOT_ACCEL_REDIRECT')
 
     # Ensure upload directory exists
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
-    # Initialize database
-    db.init_app(app)
+    # Initialize database (URI and engine settings come from the environment)
+    init_database(app)
+
+    # Process pool rendering screenshot thumbnails
+    init_thumbnails(app)
+
+    # Background thread removing unreferenced screenshot files
+    init_storage(app)
+
+    # In-process cache of read responses, keyed by data version
+    init_response_cache(app)
+
+    # Request latency, SQL and response size metrics at /api/metrics
+    init_metrics(app)
 
     # Register routes
     register_routes(app)
+    register_analytics_routes(app)
+    register_timeseries_routes(app)
+    register_export_job_routes(app)
+    register_change_routes(app)
+
+    # Register CLI commands
+    register_commands(app)
 
     return app
 
 
+# Development server only; run `flask --app app init-db` first. Production
+# serves wsgi:app with gunicorn (see gunicorn.conf.py).
 if __name__ == '__main__':
     app = create_app()
-
-    # Create database tables if they don't exist
-    with app.app_context():
-        db.create_all()
-
     app.run(debug=True)
 
-with app.app_context():
-    db.create_all()
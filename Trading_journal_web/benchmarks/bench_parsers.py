@@ -0,0 +1,121 @@
+"""Golden-output check and throughput benchmark for the broker statement parsers.
+
+Every corpus/<broker>/<name>.txt is parsed and compared with <name>.json, then
+the whole corpus is parsed repeatedly through the batch API and the rate is
+compared with the recorded baseline (baselines.json; a broker without one
+fails the run). Run from Trading_journal_web:
+
+    python -m benchmarks.bench_parsers
+    python -m benchmarks.bench_parsers --update-baseline
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+from parsers import BROKER_PARSERS, parse_statement, parse_statements
+
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), 'corpus')
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), 'baselines.json')
+
+
+def load_corpus(broker):
+    cases = []
+    for path in sorted(glob.glob(os.path.join(CORPUS_DIR, broker, '*.txt'))):
+        with open(path, encoding='utf-8') as f:
+            text = f.read()
+        with open(path[:-4] + '.json', encoding='utf-8') as f:
+            expected = json.load(f)
+        cases.append((os.path.basename(path)[:-4], text, expected))
+    return cases
+
+
+def check_goldens(broker, cases):
+    failures = []
+    for name, text, expected in cases:
+        actual = parse_statement(text, broker)
+        if actual != expected:
+            failures.append(f"{broker}/{name}: expected {expected}, got {actual}")
+    return failures
+
+
+def measure(broker, cases, repeat, runs=5):
+    """Best statements/second over several runs of the batch parser"""
+    # Cases without a header merge into the previous statement once
+    # concatenated, so the rate counts the statements actually produced
+    texts = [text.strip() for _, text, _ in cases]
+    batch = '\n'.join(texts * repeat)
+    expected_count = len(parse_statements(batch, broker))
+
+    best = 0.0
+    for _ in range(runs):
+        start = time.perf_counter()
+        parse_statements(batch, broker)
+        elapsed = time.perf_counter() - start
+        best = max(best, expected_count / elapsed)
+    return best
+
+
+def load_baselines():
+    if not os.path.exists(BASELINE_FILE):
+        return {}
+    with open(BASELINE_FILE) as f:
+        return json.load(f)
+
+
+def save_baselines(baselines):
+    with open(BASELINE_FILE, 'w') as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=500, help='corpus copies per batch')
+    parser.add_argument('--max-regression', type=float, default=0.25,
+                        help='allowed fractional drop below the baseline rate')
+    parser.add_argument('--update-baseline', action='store_true', help='record the measured rates')
+    args = parser.parse_args(argv)
+
+    baselines = load_baselines()
+    parser_baselines = baselines.setdefault('parsers', {})
+    failed = False
+
+    for broker in sorted(BROKER_PARSERS):
+        cases = load_corpus(broker)
+        if not cases:
+            print(f"{broker}: no corpus")
+            continue
+
+        failures = check_goldens(broker, cases)
+        for failure in failures:
+            print(f"GOLDEN MISMATCH {failure}")
+        failed = failed or bool(failures)
+
+        rate = measure(broker, cases, args.repeat)
+        baseline = parser_baselines.get(broker, {}).get('statements_per_second')
+        line = f"{broker}: {len(cases)} golden cases, {rate:,.0f} statements/s"
+        if baseline:
+            change = rate / baseline - 1
+            line += f" ({change:+.1%} vs baseline {baseline:,.0f})"
+            if change < -args.max_regression:
+                line += " REGRESSION"
+                failed = True
+        elif not args.update_baseline:
+            line += " NO BASELINE (run with --update-baseline)"
+            failed = True
+        print(line)
+
+        if args.update_baseline:
+            parser_baselines[broker] = {'statements_per_second': round(rate)}
+
+    if args.update_baseline:
+        save_baselines(baselines)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,265 @@
+"""Latency, throughput and memory benchmark for the API routes.
+
+A temporary database is seeded with a synthetic history, then every route is
+driven through the Flask test client (or, with --http, a threaded local server
+and concurrent HTTP clients). p50/p99 latency, requests/s and the peak
+Python memory each route allocates are reported and compared with the
+recorded baseline; a route without a baseline fails the run. Run from
+Trading_journal_web:
+
+    python -m benchmarks.bench_routes --trades 10000
+    python -m benchmarks.bench_routes --trades 100000 --http --concurrency 8
+    python -m benchmarks.bench_routes --trades 10000 --update-baseline
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmarks.bench_parsers import load_baselines, save_baselines, load_corpus
+from benchmarks.synthetic import png_bytes, seed
+
+
+# Requests per route replayed under tracemalloc (tracing slows them down,
+# so latency is measured on an untraced pass)
+MEMORY_REQUESTS = 3
+
+# Allocation peaks below this much growth are noise
+MEMORY_SLACK_MB = 1.0
+
+# Metric -> True when higher is worse
+METRICS = {'p50_ms': True, 'p99_ms': True, 'rps': False, 'peak_alloc_mb': True}
+
+
+def multipart(field, filename, content, mimetype='image/png'):
+    boundary = uuid.uuid4().hex
+    body = (
+        f'--{boundary}\r\n'
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f'Content-Type: {mimetype}\r\n\r\n'
+    ).encode() + content + f'\r\n--{boundary}--\r\n'.encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+def build_routes(trade_count, rng, upload_count):
+    """Route name -> (heavy, request factory); a factory returns (method, path, body, content type)"""
+    statement = load_corpus('xstation5')[0][1]
+    parse_body = json.dumps({'clipboard_text': statement}).encode()
+    uploads = [multipart('screenshot', 'chart.png', png_bytes(320, 180, rng)) for _ in range(upload_count)]
+
+    def trade_id():
+        return rng.randint(1, trade_count)
+
+    def upload():
+        body, content_type = uploads[rng.randrange(len(uploads))]
+        return 'POST', f'/api/trades/{trade_id()}/screenshots', body, content_type
+
+    return {
+        'trades-page': (False, lambda: ('GET', '/api/trades?limit=100', None, None)),
+        'trades-page-filtered': (False, lambda: ('GET', '/api/trades?limit=100&instrument=NQ&outcome=win', None, None)),
+        'trade-detail': (False, lambda: ('GET', f'/api/trades/{trade_id()}', None, None)),
+        'search': (False, lambda: ('GET', '/api/trades/search?q=breakout', None, None)),
+        'analytics-summary': (False, lambda: ('GET', '/api/analytics/summary', None, None)),
+        'analytics-summary-outcome': (False, lambda: ('GET', '/api/analytics/summary?outcome=win', None, None)),
+        'parse-trade': (False, lambda: ('POST', '/api/parse-trade', parse_body, 'application/json')),
+        'upload-screenshot': (False, upload),
+        'analytics-equity-curve': (True, lambda: ('GET', '/api/analytics/equity-curve', None, None)),
+        'trades-ndjson': (True, lambda: ('GET', '/api/trades?format=ndjson', None, None)),
+        'export-excel': (True, lambda: ('GET', '/api/export/excel', None, None)),
+    }
+
+
+def peak_alloc_mb(run):
+    """Peak Python heap growth while run() executes, in MB (all threads)"""
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return (peak - baseline) / (1024 * 1024)
+
+
+def run_client(app, factory, requests):
+    client = app.test_client()
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(requests):
+        method, path, body, content_type = factory()
+        t = time.perf_counter()
+        response = client.open(path, method=method, data=body, content_type=content_type)
+        response.get_data()
+        response.close()
+        latencies.append(time.perf_counter() - t)
+        if response.status_code >= 400:
+            raise RuntimeError(f'{method} {path} returned {response.status_code}')
+    return latencies, time.perf_counter() - start
+
+
+def run_http(base_url, factory, requests, concurrency):
+    def call():
+        method, path, body, content_type = factory()
+        headers = {'Content-Type': content_type} if content_type else {}
+        t = time.perf_counter()
+        with urllib.request.urlopen(urllib.request.Request(base_url + path, data=body, method=method, headers=headers)) as response:
+            response.read()
+        return time.perf_counter() - t
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(lambda _: call(), range(requests)))
+    return latencies, time.perf_counter() - start
+
+
+def start_server(app):
+    from werkzeug.serving import make_server
+
+    # One access log line per request would dominate the output
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def create_bench_app(workdir, cache):
+    # Configure through the environment before the app reads it
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'trades.db')}"
+    os.environ['SLOW_QUERY_MS'] = os.environ.get('SLOW_QUERY_MS', '60000')
+    if not cache:
+        os.environ['RESPONSE_CACHE_BYTES'] = '0'
+
+    from app import create_app
+    from migrations import upgrade_database
+
+    app = create_app()
+    # Exports and relative upload paths resolve against the root path
+    app.root_path = workdir
+    app.config['UPLOAD_FOLDER'] = os.path.join(workdir, 'static', 'uploads')
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    with app.app_context():
+        upgrade_database()
+    return app
+
+
+def compare(name, result, baseline, max_regression, required=True):
+    """Format one result line; returns (line, regressed)"""
+    line = (f"{name:28} p50 {result['p50_ms']:9.2f} ms  p99 {result['p99_ms']:9.2f} ms  "
+            f"{result['rps']:9.1f} req/s  peak alloc {result['peak_alloc_mb']:7.1f} MB")
+    if not baseline:
+        if not required:
+            return line, False
+        return line + "  NO BASELINE (run with --update-baseline)", True
+
+    regressed = []
+    for metric, higher_is_worse in METRICS.items():
+        if metric not in baseline:
+            regressed.append(f"{metric} missing")
+        elif higher_is_worse:
+            limit = baseline[metric] * (1 + max_regression)
+            if metric == 'peak_alloc_mb':
+                limit = max(limit, baseline[metric] + MEMORY_SLACK_MB)
+            if result[metric] > limit:
+                regressed.append(metric)
+        elif result[metric] < baseline[metric] * (1 - max_regression):
+            regressed.append(metric)
+    if 'p50_ms' in baseline:
+        line += f"  ({result['p50_ms'] / baseline['p50_ms'] - 1:+.1%} p50 vs baseline)"
+    if regressed:
+        line += f" REGRESSION ({', '.join(regressed)})"
+    return line, bool(regressed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--trades', type=int, default=10000, help='synthetic history size (e.g. 10000, 100000, 1000000)')
+    parser.add_argument('--screenshot-ratio', type=float, default=0.2, help='share of trades with screenshots')
+    parser.add_argument('--requests', type=int, default=200, help='requests per route')
+    parser.add_argument('--heavy-requests', type=int, default=3, help='requests per full-history route')
+    parser.add_argument('--routes', help='comma separated subset of routes')
+    parser.add_argument('--http', action='store_true', help='drive a local threaded server over HTTP')
+    parser.add_argument('--concurrency', type=int, default=4, help='concurrent HTTP clients')
+    parser.add_argument('--cache', action='store_true', help='keep the response cache enabled')
+    parser.add_argument('--workdir', help='reuse (or create) a seeded database here instead of a temporary one')
+    parser.add_argument('--max-regression', type=float, default=0.25,
+                        help='allowed fractional change for the worse against the baseline, per metric')
+    parser.add_argument('--update-baseline', action='store_true', help='record the measured results')
+    args = parser.parse_args(argv)
+
+    workdir = os.path.abspath(args.workdir) if args.workdir else tempfile.mkdtemp(prefix='bench-routes-')
+    os.makedirs(workdir, exist_ok=True)
+    fresh = not os.path.exists(os.path.join(workdir, 'trades.db'))
+    app = create_bench_app(workdir, args.cache)
+    rng = random.Random(0)
+
+    try:
+        if fresh:
+            start = time.perf_counter()
+            with app.app_context():
+                seed(args.trades, app.config['UPLOAD_FOLDER'], args.screenshot_ratio)
+            print(f"Seeded {args.trades} trades in {time.perf_counter() - start:.1f} s")
+
+        routes = build_routes(args.trades, rng, min(args.requests, 50))
+        if args.routes:
+            routes = {name: routes[name] for name in args.routes.split(',')}
+
+        server = base_url = None
+        if args.http:
+            server, base_url = start_server(app)
+
+        mode = f"{'http' if args.http else 'client'}-{args.trades}"
+        baselines = load_baselines()
+        route_baselines = baselines.setdefault('routes', {}).setdefault(mode, {})
+        failed = False
+
+        print(f"{mode}: {len(routes)} routes")
+        for name, (heavy, factory) in routes.items():
+            requests = args.heavy_requests if heavy else args.requests
+            if args.http:
+                def run(count):
+                    return run_http(base_url, factory, count, args.concurrency)
+            else:
+                def run(count):
+                    return run_client(app, factory, count)
+
+            latencies, elapsed = run(requests)
+            result = {
+                'p50_ms': float(np.percentile(latencies, 50) * 1000),
+                'p99_ms': float(np.percentile(latencies, 99) * 1000),
+                'rps': requests / elapsed,
+                'peak_alloc_mb': peak_alloc_mb(lambda: run(min(requests, MEMORY_REQUESTS))),
+            }
+            line, regressed = compare(
+                name, result, route_baselines.get(name), args.max_regression, required=not args.update_baseline
+            )
+            print(line)
+            failed = failed or regressed
+            if args.update_baseline:
+                route_baselines[name] = {key: round(value, 3) for key, value in result.items()}
+
+        if server is not None:
+            server.shutdown()
+        if args.update_baseline:
+            save_baselines(baselines)
+        return 1 if failed else 0
+    finally:
+        # Let queued thumbnails finish before their files are removed
+        app.extensions['thumbnails'].shutdown()
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
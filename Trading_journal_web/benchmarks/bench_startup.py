@@ -0,0 +1,128 @@
+"""Startup time of the WSGI application.
+
+Each run starts a fresh interpreter that imports wsgi (create_app included)
+and reports how long that took, so worker boot cost is measured the way a
+pre-fork server without preloading pays it. The median is compared with the
+recorded baseline (a missing one fails the run); --importtime lists the
+slowest top-level imports and --forbid names modules that must not be loaded
+at startup. Run from Trading_journal_web:
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --importtime 15
+    python -m benchmarks.bench_startup --update-baseline
+"""
+import argparse
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.bench_parsers import load_baselines, save_baselines
+
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Optional or heavy dependencies only some routes need
+LAZY_MODULES = ['numpy', 'openpyxl', 'pyarrow', 'PIL', 'cProfile']
+
+_PROBE = """
+import sys, time
+start = time.perf_counter()
+import wsgi
+elapsed = time.perf_counter() - start
+print(elapsed, ' '.join(name for name in {lazy!r} if name in sys.modules))
+"""
+
+_IMPORTTIME_RE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def _environment(workdir):
+    env = dict(os.environ, PYTHONPATH=APP_DIR)
+    # A throwaway database, so no real data file is touched
+    env.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(workdir, 'startup.db')}")
+    return env
+
+
+def measure(runs, workdir):
+    """Seconds to import wsgi per run, and the lazy modules that got loaded"""
+    times = []
+    loaded = set()
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', _PROBE.format(lazy=LAZY_MODULES)],
+            cwd=workdir, env=_environment(workdir), capture_output=True, text=True, check=True,
+        ).stdout.split()
+        times.append(float(output[0]))
+        loaded.update(output[1:])
+    return times, sorted(loaded)
+
+
+def slowest_imports(count, workdir):
+    """(cumulative microseconds, module) of the slowest top-level imports"""
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import wsgi'],
+        cwd=workdir, env=_environment(workdir), capture_output=True, text=True, check=True,
+    ).stderr
+    imports = []
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        # Direct imports of wsgi and app (two levels of nesting)
+        if match and len(match.group(3)) <= 5:
+            imports.append((int(match.group(2)), match.group(4)))
+    return sorted(imports, reverse=True)[:count]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10, help='fresh interpreters to start')
+    parser.add_argument('--importtime', type=int, default=0, metavar='N', help='list the N slowest imports')
+    parser.add_argument('--forbid', default=','.join(LAZY_MODULES),
+                        help='comma separated modules that must not load at startup')
+    parser.add_argument('--max-regression', type=float, default=0.25,
+                        help='allowed fractional increase over the baseline median')
+    parser.add_argument('--update-baseline', action='store_true', help='record the measured median')
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='startup-bench-')
+    try:
+        times, loaded = measure(args.runs, workdir)
+        imports = slowest_imports(args.importtime, workdir) if args.importtime else []
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    median_ms = statistics.median(times) * 1000
+    baselines = load_baselines()
+    baseline = baselines.get('startup', {}).get('median_ms')
+    failed = False
+
+    line = f"startup: median {median_ms:.0f} ms, best {min(times) * 1000:.0f} ms over {len(times)} runs"
+    if baseline:
+        change = median_ms / baseline - 1
+        line += f" ({change:+.1%} vs baseline {baseline:.0f} ms)"
+        if change > args.max_regression:
+            line += " REGRESSION"
+            failed = True
+    elif not args.update_baseline:
+        line += " NO BASELINE (run with --update-baseline)"
+        failed = True
+    print(line)
+
+    forbidden = [name for name in loaded if name in args.forbid.split(',')]
+    if forbidden:
+        print(f"EAGER IMPORTS {', '.join(forbidden)}")
+        failed = True
+
+    for micros, module in imports:
+        print(f"  {micros / 1000:8.1f} ms  {module}")
+
+    if args.update_baseline:
+        baselines['startup'] = {'median_ms': round(median_ms, 1)}
+        save_baselines(baselines)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""Synthetic trade histories for load tests.
+
+Trades follow a per-instrument random walk with realistic stops, targets,
+win rate, durations and journal notes; a share of them get screenshots that
+point at a pool of generated PNG blobs, as content-addressed storage would.
+Seed the database configured by DATABASE_URL from Trading_journal_web:
+
+    python -m benchmarks.synthetic --trades 100000
+"""
+import argparse
+import hashlib
+import os
+import random
+import struct
+import zlib
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from bulk_import import insert_trades
+from models import db, Screenshot
+from rollups import rebuild_rollups
+from trade_metrics import derived_values
+
+
+CHUNK_SIZE = 10000
+
+# Instrument -> (start price, typical stop distance, P/L per point and lot)
+INSTRUMENTS = {
+    'NQ': (15000.0, 40.0, 20.0),
+    'ES': (4500.0, 10.0, 50.0),
+    'GER40': (16000.0, 40.0, 25.0),
+    'EURUSD': (1.08, 0.002, 100000.0),
+    'GBPUSD': (1.26, 0.0025, 100000.0),
+    'USDJPY': (150.0, 0.3, 670.0),
+    'XAUUSD': (2000.0, 8.0, 100.0),
+}
+
+NOTES = [
+    'breakout after consolidation', 'moved stop to break even', 'FOMO entry, chased the move',
+    'followed the plan', 'exited early on news', 'revenge trade after a loss', 'trend continuation',
+    'fade at resistance', 'gap fill', 'overtrading today', 'waited for confirmation',
+    'stop too tight', 'scaled out at first target', 'ignored the higher timeframe',
+]
+
+SCREENSHOT_POOL = 200
+
+
+def png_bytes(width, height, rng):
+    """A valid RGB PNG of random noise (incompressible, like a real chart capture)"""
+    raw = b''.join(b'\x00' + rng.randbytes(width * 3) for _ in range(height))
+
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff)
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(raw)) + chunk(b'IEND', b'')
+
+
+def generate_trades(count, rng, end=None):
+    """Yield trade rows ready for bulk_import.insert_trades, oldest first"""
+    end = end or datetime.utcnow()
+    # About eight trades per day
+    timestamp = end - timedelta(days=count / 8)
+    prices = {name: spec[0] for name, spec in INSTRUMENTS.items()}
+    names = list(INSTRUMENTS)
+
+    for _ in range(count):
+        instrument = rng.choice(names)
+        _, stop_distance, point_value = INSTRUMENTS[instrument]
+        price = prices[instrument] = max(prices[instrument] + rng.gauss(0, stop_distance), stop_distance * 10)
+
+        long = rng.random() < 0.55
+        sign = 1 if long else -1
+        stop = stop_distance * rng.uniform(0.5, 1.5)
+        target = stop * rng.choice([0.5, 1, 1.5, 2, 2.5, 3, 4])
+        roll = rng.random()
+        if roll < 0.42:
+            move = target
+        elif roll < 0.85:
+            move = -stop
+        else:
+            move = rng.uniform(-stop, target)
+
+        size = rng.choice([0.1, 0.5, 1, 2, 5]) if point_value > 1000 else rng.choice([1, 2, 3])
+        lot_value = point_value * (0.01 if point_value > 1000 else 1)
+        minutes = max(1, int(rng.lognormvariate(3, 1)))
+        timestamp += timedelta(minutes=rng.expovariate(8 / (24 * 60)))
+        open_time = timestamp - timedelta(minutes=minutes)
+
+        row = {
+            'timestamp': timestamp,
+            'instrument': instrument,
+            'direction': 'Long' if long else 'Short',
+            'entry': round(price, 5),
+            'exit': round(price + sign * move, 5),
+            'stop_loss': round(price - sign * stop, 5),
+            'take_profit': round(price + sign * target, 5),
+            'size': size,
+            'risk': round(stop * size * lot_value, 2),
+            'reward': round(target * size * lot_value, 2),
+            'profit_loss': round(move * size * lot_value, 2),
+            'duration': f'{minutes} min',
+            'comments': rng.choice(NOTES) if rng.random() < 0.7 else '',
+            'open_time': open_time,
+            'close_time': timestamp,
+        }
+        row.update(derived_values(row['profit_loss'], row['risk'], row['duration'], open_time, timestamp))
+        yield row
+
+
+def write_screenshot_pool(folder, rng, size=(64, 36)):
+    """Write SCREENSHOT_POOL small PNG blobs under their content address; returns the filenames"""
+    os.makedirs(folder, exist_ok=True)
+    filenames = []
+    for _ in range(SCREENSHOT_POOL):
+        data = png_bytes(*size, rng)
+        filename = f'{hashlib.sha256(data).hexdigest()}.png'
+        with open(os.path.join(folder, filename), 'wb') as f:
+            f.write(data)
+        filenames.append(filename)
+    return filenames
+
+
+def seed(count, upload_folder, screenshot_ratio=0.2, seed_value=0):
+    """Insert count synthetic trades (and screenshots) and rebuild the rollups; needs an app context"""
+    rng = random.Random(seed_value)
+    pool = write_screenshot_pool(upload_folder, rng) if screenshot_ratio else []
+
+    trades = generate_trades(count, rng)
+    while True:
+        rows = [row for _, row in zip(range(CHUNK_SIZE), trades)]
+        if not rows:
+            break
+        trade_ids = insert_trades(rows)
+        screenshots = [
+            {
+                'filename': filename,
+                'filepath': os.path.join(upload_folder, filename),
+                'trade_id': trade_id,
+            }
+            for trade_id in trade_ids if rng.random() < screenshot_ratio
+            for filename in rng.sample(pool, rng.choice([1, 1, 2]))
+        ]
+        if screenshots:
+            db.session.execute(insert(Screenshot), screenshots)
+        db.session.commit()
+
+    rebuild_rollups()
+    return count
+
+
+def main(argv=None):
+    from app import create_app
+    from migrations import upgrade_database
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--trades', type=int, default=10000)
+    parser.add_argument('--screenshot-ratio', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    app = create_app()
+    with app.app_context():
+        upgrade_database()
+        seed(args.trades, app.config['UPLOAD_FOLDER'], args.screenshot_ratio, args.seed)
+    print(f"Seeded {args.trades} trades into {app.config['SQLALCHEMY_DATABASE_URI']}")
+
+
+if __name__ == '__main__':
+    main()
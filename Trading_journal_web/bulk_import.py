@@ -0,0 +1,155 @@
+from sqlalchemy import insert, delete
+from models import db, Trade, Screenshot
+from parsers import BROKER_PARSERS, parse_statements
+from trade_metrics import parse_trade_time, derived_values
+from datetime import datetime
+import csv
+import io
+import json
+
+
+REQUIRED_FIELDS = ['instrument', 'direction', 'entry', 'exit', 'profit_loss']
+OPTIONAL_FLOAT_FIELDS = ['stop_loss', 'take_profit', 'size', 'risk', 'reward']
+TEXT_FIELDS = ['duration', 'comments']
+
+# Accepted direction spellings -> stored direction
+DIRECTIONS = {'long': 'long', 'short': 'short', 'buy': 'long', 'sell': 'short'}
+
+# Ids per DELETE statement (keeps IN lists under the bound parameter limit)
+DELETE_BATCH_SIZE = 500
+
+# CSV header spellings accepted besides the column names (e.g. our own exports)
+HEADER_ALIASES = {
+    'p/l': 'profit_loss',
+    'pl': 'profit_loss',
+}
+
+
+def records_from_csv(text):
+    reader = csv.DictReader(io.StringIO(text))
+    records = []
+    for raw in reader:
+        record = {}
+        for header, value in raw.items():
+            if header is None:
+                continue
+            key = header.strip().lower().replace(' ', '_')
+            record[HEADER_ALIASES.get(key, key)] = value
+        records.append(record)
+    return records
+
+
+def records_from_payload(body, content_type, fmt):
+    """Turn a bulk request body into a list of raw trade dicts.
+
+    fmt is 'json', 'csv' or a broker format from parsers.BROKER_PARSERS; when
+    missing it is taken from the content type (plain text is treated as
+    xStation5 clipboard blocks).
+    """
+    if not fmt:
+        if 'json' in content_type:
+            fmt = 'json'
+        elif 'csv' in content_type:
+            fmt = 'csv'
+        else:
+            fmt = 'xstation5'
+
+    text = body.decode('utf-8-sig')
+    if fmt == 'json':
+        try:
+            records = json.loads(text)
+        except ValueError:
+            raise ValueError('Invalid JSON')
+        if not isinstance(records, list):
+            raise ValueError('Expected a JSON array of trades')
+        return records
+    if fmt == 'csv':
+        return records_from_csv(text)
+    if fmt in BROKER_PARSERS:
+        return parse_statements(text, fmt)
+    raise ValueError(f'Unsupported format: {fmt}')
+
+
+def _parse_timestamp(record):
+    """timestamp (ISO), else open_time in any format parse_trade_time reads, else now"""
+    value = record.get('timestamp')
+    if value:
+        if isinstance(value, datetime):
+            return value
+        return datetime.fromisoformat(str(value).strip())
+    return parse_trade_time(record.get('open_time')) or datetime.utcnow()
+
+
+def validate_record(record):
+    """Return (row, None) for a valid record or (None, error message)"""
+    if not isinstance(record, dict):
+        return None, 'Expected an object'
+
+    row = {}
+    for field in REQUIRED_FIELDS:
+        value = record.get(field)
+        if value is None or value == '':
+            return None, f'Missing {field}'
+        row[field] = value
+
+    try:
+        for field in ['entry', 'exit', 'profit_loss']:
+            row[field] = float(row[field])
+        for field in OPTIONAL_FLOAT_FIELDS:
+            value = record.get(field)
+            row[field] = float(value) if value not in (None, '') else 0.0
+    except (TypeError, ValueError):
+        return None, f'Invalid number in {field}'
+
+    direction = DIRECTIONS.get(str(row['direction']).strip().lower())
+    if direction is None:
+        return None, 'Invalid direction (expected long or short)'
+    row['direction'] = direction
+
+    try:
+        row['timestamp'] = _parse_timestamp(record)
+    except (TypeError, ValueError):
+        return None, 'Invalid timestamp'
+    for field in ['open_time', 'close_time']:
+        try:
+            row[field] = parse_trade_time(record.get(field))
+        except (TypeError, ValueError):
+            return None, f'Invalid {field}'
+
+    row['instrument'] = str(row['instrument'])
+    row['risk_currency'] = str(record.get('risk_currency') or '').strip().upper() or None
+    for field in TEXT_FIELDS:
+        row[field] = str(record.get(field) or '')
+    row.update(derived_values(row['profit_loss'], row['risk'], row['duration'], row['open_time'], row['close_time']))
+    return row, None
+
+
+def insert_trades(rows):
+    """Insert validated rows with one batched insert in the current transaction; returns the new ids"""
+    if not rows:
+        return []
+    return list(db.session.scalars(insert(Trade).returning(Trade.id), rows))
+
+
+def delete_trades(trade_ids):
+    """Delete trades and their screenshot rows with set-based statements in the current transaction.
+
+    Returns the deleted trades as rows for rollups.apply_trades and the
+    filenames their screenshots used (for storage.reap_files after commit).
+    """
+    ids = sorted(set(trade_ids))
+    rows = []
+    filenames = []
+    for start in range(0, len(ids), DELETE_BATCH_SIZE):
+        batch = ids[start:start + DELETE_BATCH_SIZE]
+        filenames.extend(db.session.scalars(
+            delete(Screenshot).where(Screenshot.trade_id.in_(batch)).returning(Screenshot.filename),
+            execution_options={'synchronize_session': False},
+        ))
+        rows.extend(row._asdict() for row in db.session.execute(
+            delete(Trade).where(Trade.id.in_(batch)).returning(
+                Trade.id, Trade.timestamp, Trade.instrument, Trade.direction, Trade.profit_loss
+            ),
+            execution_options={'synchronize_session': False},
+        ))
+    return rows, filenames
@@ -0,0 +1,150 @@
+from flask import request, jsonify, current_app, stream_with_context
+from sqlalchemy import select, insert, delete, func
+from sqlalchemy.orm import selectinload
+from models import db, Trade, TradeChange
+from queries import page_size
+from datetime import datetime, timedelta
+import json
+import time
+
+
+DEFAULT_CHANGES_LIMIT = 1000
+
+
+def record_change(trade_id, action):
+    """Log a trade change inside the caller's transaction"""
+    db.session.add(TradeChange(trade_id=trade_id, action=action))
+
+
+def record_changes(trade_ids, action):
+    if trade_ids:
+        db.session.execute(insert(TradeChange), [{'trade_id': trade_id, 'action': action} for trade_id in trade_ids])
+
+
+def latest_cursor():
+    return db.session.execute(select(func.max(TradeChange.id))).scalar() or 0
+
+
+def cursor_expired(since):
+    """True when entries after since have been pruned, so the client must reload"""
+    oldest = db.session.execute(select(func.min(TradeChange.id))).scalar()
+    return oldest is not None and since < oldest - 1
+
+
+def changes_since(since, limit=DEFAULT_CHANGES_LIMIT):
+    """Changes after cursor since, one entry per trade: (entries, cursor, has_more).
+
+    Entries are {'op': 'upsert', 'trade': {...}} with the trade's current state
+    or {'op': 'delete', 'id': ...}, ordered by their latest change.
+    """
+    rows = db.session.execute(
+        select(TradeChange.id, TradeChange.trade_id, TradeChange.action)
+        .where(TradeChange.id > since)
+        .order_by(TradeChange.id)
+        .limit(limit + 1)
+    ).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    latest = {}
+    for _, trade_id, action in rows:
+        latest.pop(trade_id, None)
+        latest[trade_id] = action
+
+    live_ids = [trade_id for trade_id, action in latest.items() if action != 'delete']
+    trades = {}
+    if live_ids:
+        trades = {
+            trade.id: trade
+            for trade in Trade.query.options(selectinload(Trade.screenshots)).filter(Trade.id.in_(live_ids))
+        }
+
+    entries = []
+    for trade_id in latest:
+        trade = trades.get(trade_id)
+        if trade is None:
+            entries.append({'op': 'delete', 'id': trade_id})
+        else:
+            entries.append({'op': 'upsert', 'trade': trade.to_dict()})
+    return entries, rows[-1].id if rows else since, has_more
+
+
+def prune_changes(days):
+    """Drop entries older than days, always keeping the newest one; returns the count"""
+    newest = latest_cursor()
+    result = db.session.execute(
+        delete(TradeChange).where(
+            TradeChange.created_at < datetime.utcnow() - timedelta(days=days),
+            TradeChange.id < newest,
+        )
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def _since(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid cursor: {value}")
+
+
+def register_change_routes(app):
+    # Incremental sync: call without ?since= for the current cursor (before
+    # loading /api/trades), then poll with the returned cursor
+    @app.route('/api/changes', methods=['GET'])
+    def get_changes():
+        if request.args.get('since') is None:
+            return jsonify({'changes': [], 'cursor': latest_cursor(), 'has_more': False})
+        try:
+            since = _since(request.args['since'])
+            limit = page_size(request.args) or DEFAULT_CHANGES_LIMIT
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if cursor_expired(since):
+            return jsonify({'error': 'Cursor expired, reload all trades'}), 410
+
+        entries, cursor, has_more = changes_since(since, limit)
+        return jsonify({'changes': entries, 'cursor': cursor, 'has_more': has_more})
+
+    # The same feed as Server-Sent Events; reconnecting browsers resume from
+    # Last-Event-ID. Polls the log, so it works across worker processes.
+    @app.route('/api/changes/stream', methods=['GET'])
+    def stream_changes():
+        try:
+            since = request.headers.get('Last-Event-ID') or request.args.get('since')
+            since = latest_cursor() if since is None else _since(since)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        poll_seconds = app.config.get('CHANGES_POLL_SECONDS', 1.0)
+        heartbeat_seconds = app.config.get('CHANGES_HEARTBEAT_SECONDS', 15.0)
+
+        def generate():
+            cursor = since
+            idle = 0.0
+            yield 'retry: 3000\n\n'
+            while True:
+                if cursor_expired(cursor):
+                    db.session.close()
+                    yield 'event: reset\ndata: {}\n\n'
+                    return
+                entries, cursor, has_more = changes_since(cursor)
+                # Release the connection (and its read snapshot) between polls
+                db.session.close()
+                if entries:
+                    yield f"id: {cursor}\nevent: changes\ndata: {json.dumps(entries)}\n\n"
+                    idle = 0.0
+                    if has_more:
+                        continue
+                elif idle >= heartbeat_seconds:
+                    yield ': keep-alive\n\n'
+                    idle = 0.0
+                time.sleep(poll_seconds)
+                idle += poll_seconds
+
+        response = current_app.response_class(stream_with_context(generate()), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        # Keep nginx from buffering the stream
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
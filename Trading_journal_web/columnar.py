@@ -0,0 +1,133 @@
+from flask import current_app, request
+from sqlalchemy import select
+from models import db, Trade, Screenshot
+from functools import lru_cache
+import json
+
+
+COLUMNS_MIMETYPE = 'application/vnd.trading-journal.columns+json'
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.stream'
+
+# ?format= value -> mimetype
+FORMATS = {
+    'columns': COLUMNS_MIMETYPE,
+    'arrow': ARROW_MIMETYPE,
+}
+
+# The Trade.to_dict fields, selected as plain columns
+TRADE_COLUMNS = [
+    Trade.id, Trade.timestamp, Trade.instrument, Trade.direction, Trade.entry, Trade.exit,
+    Trade.stop_loss, Trade.take_profit, Trade.size, Trade.risk, Trade.reward,
+    Trade.profit_loss, Trade.duration, Trade.comments, Trade.open_time, Trade.close_time,
+    Trade.duration_seconds, Trade.r_multiple, Trade.outcome,
+]
+
+_TIME_COLUMNS = {'timestamp', 'open_time', 'close_time'}
+_STRING_COLUMNS = {'instrument', 'direction', 'duration', 'comments', 'outcome'}
+_INTEGER_COLUMNS = {'id', 'duration_seconds'}
+
+
+@lru_cache(maxsize=None)
+def arrow_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def requested_format(args, accept_mimetypes):
+    """'columns' or 'arrow' when the client asked for a columnar payload, else None.
+
+    ?format= wins over the Accept header; raises ValueError when Arrow is
+    asked for explicitly and pyarrow isn't installed.
+    """
+    fmt = args.get('format')
+    if fmt in FORMATS:
+        if fmt == 'arrow' and not arrow_available():
+            raise ValueError('arrow format requires pyarrow')
+        return fmt
+
+    # Plain JSON stays the answer for */* and ties
+    offered = ['application/json', COLUMNS_MIMETYPE]
+    if arrow_available():
+        offered.append(ARROW_MIMETYPE)
+    best = accept_mimetypes.best_match(offered)
+    for name, mimetype in FORMATS.items():
+        if best == mimetype:
+            return name
+    return None
+
+
+def wants_columns():
+    return requested_format(request.args, request.accept_mimetypes)
+
+
+def _iso(values):
+    return [value.isoformat() if value is not None else None for value in values]
+
+
+def _arrow_type(pa, name):
+    if name in _TIME_COLUMNS:
+        return pa.timestamp('us')
+    if name in _STRING_COLUMNS:
+        return pa.string()
+    if name in _INTEGER_COLUMNS:
+        return pa.int64()
+    if name == 'screenshots':
+        return pa.list_(pa.struct([('id', pa.int64()), ('filename', pa.string())]))
+    # Inferred from the values (float64 prices, analytics series)
+    return None
+
+
+def _arrow_body(columns):
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+
+    arrays = [pa.array(values, type=_arrow_type(pa, name)) for name, values in columns.items()]
+    table = pa.Table.from_arrays(arrays, names=list(columns))
+    sink = pa.BufferOutputStream()
+    with ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def columns_response(columns, fmt):
+    """Serialize a dict of equal-length lists as {"count", "columns"} JSON or an Arrow IPC stream"""
+    if fmt == 'arrow':
+        return current_app.response_class(_arrow_body(columns), mimetype=ARROW_MIMETYPE)
+
+    encoded = {name: _iso(values) if name in _TIME_COLUMNS else values for name, values in columns.items()}
+    count = len(next(iter(columns.values()))) if columns else 0
+    body = json.dumps({'count': count, 'columns': encoded}, separators=(',', ':'))
+    return current_app.response_class(body, mimetype=COLUMNS_MIMETYPE)
+
+
+def trade_columns(rows, screenshot_filter):
+    """Transpose TRADE_COLUMNS rows into lists per field, plus a screenshots column.
+
+    screenshot_filter selects the screenshots to attach (an id list for a page,
+    a subquery for the whole history).
+    """
+    names = [column.key for column in TRADE_COLUMNS]
+    columns = dict(zip(names, map(list, zip(*rows)))) if rows else {name: [] for name in names}
+
+    attached = {}
+    if rows:
+        for trade_id, screenshot_id, filename in db.session.execute(
+            select(Screenshot.trade_id, Screenshot.id, Screenshot.filename)
+            .where(Screenshot.trade_id.in_(screenshot_filter))
+            .order_by(Screenshot.id)
+        ):
+            attached.setdefault(trade_id, []).append({'id': screenshot_id, 'filename': filename})
+    columns['screenshots'] = [attached.get(trade_id, []) for trade_id in columns['id']]
+    return columns
+
+
+def is_tabular(result):
+    """True for analytics results that are already a dict of equal-length lists"""
+    if not isinstance(result, dict) or not result:
+        return False
+    if not all(isinstance(values, list) for values in result.values()):
+        return False
+    return len({len(values) for values in result.values()}) == 1
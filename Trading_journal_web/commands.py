@@ -0,0 +1,70 @@
+import click
+from migrations import upgrade_database
+from rollups import rebuild_rollups
+from changes import prune_changes
+import instruments
+import storage
+import thumbnails
+
+
+def register_commands(app):
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create missing tables, columns and indexes; run on every deploy."""
+        upgrade_database()
+        click.echo('Database is up to date.')
+
+    @app.cli.command('rebuild-rollups')
+    def rebuild_rollups_command():
+        """Regenerate the dashboard rollup tables from the trade table."""
+        rebuild_rollups()
+        click.echo('Rollup tables rebuilt.')
+
+    @app.cli.command('dedupe-screenshots')
+    def dedupe_screenshots_command():
+        """Move legacy uploads to content-addressed storage, merging duplicates."""
+        updated, removed = storage.migrate_legacy_screenshots()
+        click.echo(f'{updated} screenshots migrated, {removed} duplicate files removed.')
+
+    @app.cli.command('backfill-thumbnails')
+    def backfill_thumbnails_command():
+        """Render missing screenshot thumbnails for the whole upload folder."""
+        if not thumbnails.pillow_available():
+            raise click.ClickException('Thumbnails require Pillow.')
+        rendered, failed = thumbnails.backfill_derivatives()
+        click.echo(f'{rendered} derivatives rendered, {failed} failed.')
+
+    @app.cli.command('prune-changes')
+    @click.option('--days', default=30, show_default=True, help='Keep entries newer than this.')
+    def prune_changes_command(days):
+        """Drop old change feed entries; clients behind them reload in full."""
+        removed = prune_changes(days)
+        click.echo(f'{removed} change entries removed.')
+
+    @app.cli.command('sweep-uploads')
+    @click.option('--grace-hours', default=1.0, show_default=True, help='Leave files younger than this.')
+    @click.option('--dry-run', is_flag=True, help='Only report what would be removed.')
+    def sweep_uploads_command(grace_hours, dry_run):
+        """Remove upload files that no screenshot references."""
+        removed, reclaimed = storage.sweep_orphans(grace_hours * 3600, dry_run)
+        verb = 'would be removed' if dry_run else 'removed'
+        click.echo(f'{removed} orphaned files {verb} ({reclaimed / (1024 * 1024):.1f} MB).')
+
+    @app.cli.command('set-instrument-spec')
+    @click.argument('symbol')
+    @click.option('--pip-size', type=float, required=True, help='Price step of one pip (0.0001, 0.01 for JPY pairs, 1 for indices).')
+    @click.option('--contract-size', type=float, required=True, help='Units per 1.0 lot.')
+    @click.option('--quote-currency', help='Currency the risk and reward are stated in.')
+    def set_instrument_spec_command(symbol, pip_size, contract_size, quote_currency):
+        """Register the contract details of an instrument; run recompute-risk afterwards."""
+        if pip_size <= 0 or contract_size <= 0:
+            raise click.ClickException('Pip size and contract size must be positive.')
+        instruments.set_spec(symbol, pip_size, contract_size, quote_currency)
+        click.echo(f'{symbol.upper()}: pip size {pip_size}, contract size {contract_size}.')
+
+    @app.cli.command('recompute-risk')
+    @click.option('--instrument', multiple=True, help='Only these instruments (repeatable).')
+    def recompute_risk_command(instrument):
+        """Recalculate risk, reward and R-multiple of stored trades from the instrument specs."""
+        checked, updated = instruments.recompute_risk_reward(list(instrument) or None)
+        click.echo(f'{checked} trades checked, {updated} updated.')
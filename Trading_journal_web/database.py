@@ -0,0 +1,71 @@
+from sqlalchemy import event
+from models import db
+import os
+
+
+DEFAULT_DATABASE_URI = 'sqlite:///trades.db'
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def database_uri():
+    uri = os.environ.get('DATABASE_URL', DEFAULT_DATABASE_URI)
+    # Hosting providers still hand out the scheme SQLAlchemy 1.4 dropped
+    if uri.startswith('postgres://'):
+        uri = 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+
+def configure_database(app):
+    """Engine settings from the environment.
+
+    SQLite runs in WAL mode so readers don't block the writer, with the
+    pragmas below applied to every pooled connection. Any other URI (e.g.
+    DATABASE_URL=postgresql://...) gets a sized, pre-pinged connection pool.
+    """
+    uri = database_uri()
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+
+    if uri.startswith('sqlite'):
+        busy_timeout_ms = _env_int('SQLITE_BUSY_TIMEOUT_MS', 5000)
+        app.config['SQLITE_PRAGMAS'] = {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'busy_timeout': busy_timeout_ms,
+            'mmap_size': _env_int('SQLITE_MMAP_SIZE', 256 * 1024 * 1024),
+            # Negative values are KiB rather than pages
+            'cache_size': -_env_int('SQLITE_CACHE_SIZE_KB', 64 * 1024),
+            'temp_store': 'MEMORY',
+        }
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            # The driver's own wait for a locked database, in seconds
+            'connect_args': {'timeout': busy_timeout_ms / 1000},
+        }
+    else:
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            'pool_size': _env_int('DB_POOL_SIZE', 5),
+            'max_overflow': _env_int('DB_MAX_OVERFLOW', 10),
+            'pool_timeout': _env_int('DB_POOL_TIMEOUT', 30),
+            'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800),
+            'pool_pre_ping': True,
+        }
+
+
+def init_database(app):
+    configure_database(app)
+    db.init_app(app)
+
+    pragmas = app.config.get('SQLITE_PRAGMAS')
+    if not pragmas:
+        return
+
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    with app.app_context():
+        event.listen(db.engine, 'connect', apply_pragmas)
@@ -0,0 +1,220 @@
+from flask import request, jsonify, current_app, send_file
+from werkzeug.datastructures import MultiDict
+from sqlalchemy import select, func
+from sqlalchemy.exc import SQLAlchemyError
+from concurrent.futures import ThreadPoolExecutor
+from models import db, Trade, ExportJob
+from queries import trade_filters
+from versioning import current_data_version
+from exports import WRITERS, export_rows
+from datetime import datetime, timedelta
+import json
+import logging
+import os
+import socket
+import uuid
+
+
+logger = logging.getLogger(__name__)
+
+
+FILTER_KEYS = {'instrument', 'direction', 'start_date', 'end_date', 'outcome'}
+ACTIVE_STATUSES = ('queued', 'running')
+
+
+def _artifact_dir(app):
+    return os.path.join(app.root_path, 'static', 'exports', 'jobs')
+
+
+def _owner():
+    return f"{socket.gethostname()}:{os.getpid()}"[:64]
+
+
+def _owner_alive(owner):
+    """False only for an owner on this host whose process is gone"""
+    host, _, pid = (owner or '').rpartition(':')
+    if host != socket.gethostname() or not pid.isdigit():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+def _fail_jobs(jobs, reason):
+    for job in jobs:
+        job.status = 'failed'
+        job.error = reason
+        job.finished_at = datetime.utcnow()
+    if jobs:
+        db.session.commit()
+    return len(jobs)
+
+
+def fail_stale_jobs(stale_seconds):
+    """Mark queued/running jobs without a heartbeat for stale_seconds as failed"""
+    cutoff = datetime.utcnow() - timedelta(seconds=stale_seconds)
+    heartbeat = func.coalesce(ExportJob.updated_at, ExportJob.created_at)
+    stale = ExportJob.query.filter(ExportJob.status.in_(ACTIVE_STATUSES), heartbeat < cutoff).all()
+    return _fail_jobs(stale, 'Export stopped responding')
+
+
+def fail_orphaned_jobs(stale_seconds):
+    """At startup: fail active jobs whose process died (a crash or restart) or that went stale"""
+    active = ExportJob.query.filter(ExportJob.status.in_(ACTIVE_STATUSES)).all()
+    orphaned = [job for job in active if not _owner_alive(job.owner)]
+    return _fail_jobs(orphaned, 'Export interrupted by a restart') + fail_stale_jobs(stale_seconds)
+
+
+def _find_job(export_format, filters_key, version):
+    """An unexpired job for the same export and data version, if any"""
+    jobs = ExportJob.query.filter_by(format=export_format, filters=filters_key, data_version=version).all()
+    for job in jobs:
+        if job.status in ACTIVE_STATUSES:
+            return job
+        if job.status == 'finished' and job.filepath and os.path.exists(job.filepath):
+            return job
+    return None
+
+
+def _expire_older_artifacts(job):
+    older = ExportJob.query.filter(
+        ExportJob.format == job.format,
+        ExportJob.filters == job.filters,
+        ExportJob.data_version < job.data_version,
+        ExportJob.status == 'finished',
+    ).all()
+    for old in older:
+        try:
+            os.remove(old.filepath)
+        except OSError:
+            pass
+        old.status = 'expired'
+    db.session.commit()
+
+
+def run_export_job(app, job_id):
+    with app.app_context():
+        job = db.session.get(ExportJob, job_id)
+        try:
+            writer, extension, _ = WRITERS[job.format]
+            criteria = trade_filters(MultiDict(json.loads(job.filters)))
+
+            job.status = 'running'
+            job.total_rows = db.session.execute(select(func.count(Trade.id)).where(*criteria)).scalar()
+            db.session.commit()
+
+            def progress(count):
+                job.rows_written = count
+                db.session.commit()
+
+            os.makedirs(_artifact_dir(app), exist_ok=True)
+            path = os.path.join(_artifact_dir(app), f"{job.id}.{extension}")
+            count, _ = writer(path, export_rows(criteria), progress)
+
+            job.rows_written = count
+            job.filepath = path
+            job.status = 'finished'
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+            _expire_older_artifacts(job)
+        except Exception as e:
+            db.session.rollback()
+            job = db.session.get(ExportJob, job_id)
+            job.status = 'failed'
+            job.error = str(e)
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+
+
+def register_export_job_routes(app):
+    # Bounded pool running exports outside the request threads
+    executor = ThreadPoolExecutor(
+        max_workers=app.config.get('EXPORT_WORKERS', 2),
+        thread_name_prefix='export',
+    )
+    stale_seconds = app.config.get('EXPORT_STALE_SECONDS', 900)
+
+    # Jobs left queued/running by a previous process would otherwise be
+    # handed back forever and count against EXPORT_MAX_PENDING
+    with app.app_context():
+        try:
+            failed = fail_orphaned_jobs(stale_seconds)
+        except SQLAlchemyError:
+            # Schema not created or upgraded yet (`flask init-db`)
+            db.session.rollback()
+        else:
+            if failed:
+                logger.warning("Marked %d orphaned export jobs as failed", failed)
+
+    # Submit an export job
+    @app.route('/api/export/jobs', methods=['POST'])
+    def submit_export_job():
+        data = request.get_json(silent=True) or {}
+        export_format = data.get('format', 'xlsx')
+        filters = data.get('filters') or {}
+
+        if export_format not in WRITERS:
+            return jsonify({'error': f'Unsupported format: {export_format}'}), 400
+        if export_format in ('parquet', 'feather'):
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                return jsonify({'error': f'{export_format} export requires pyarrow'}), 400
+        unknown = set(filters) - FILTER_KEYS
+        if unknown:
+            return jsonify({'error': f"Unknown filters: {', '.join(sorted(unknown))}"}), 400
+        try:
+            trade_filters(MultiDict(filters))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        filters_key = json.dumps(filters, sort_keys=True)
+        version = current_data_version()
+        fail_stale_jobs(stale_seconds)
+
+        # Unchanged data: hand back the finished (or in-flight) job
+        existing = _find_job(export_format, filters_key, version)
+        if existing is not None:
+            return jsonify(existing.to_dict()), 200
+
+        active = ExportJob.query.filter(ExportJob.status.in_(ACTIVE_STATUSES)).count()
+        if active >= app.config.get('EXPORT_MAX_PENDING', 10):
+            return jsonify({'error': 'Too many exports in progress'}), 429
+
+        job = ExportJob(
+            id=uuid.uuid4().hex,
+            format=export_format,
+            filters=filters_key,
+            data_version=version,
+            owner=_owner(),
+        )
+        db.session.add(job)
+        db.session.commit()
+
+        executor.submit(run_export_job, current_app._get_current_object(), job.id)
+        return jsonify(job.to_dict()), 202
+
+    # Poll an export job
+    @app.route('/api/export/jobs/<job_id>', methods=['GET'])
+    def get_export_job(job_id):
+        job = ExportJob.query.get_or_404(job_id)
+        return jsonify(job.to_dict())
+
+    # Download a finished export
+    @app.route('/api/export/jobs/<job_id>/download', methods=['GET'])
+    def download_export_job(job_id):
+        job = ExportJob.query.get_or_404(job_id)
+        if job.status != 'finished' or not job.filepath or not os.path.exists(job.filepath):
+            return jsonify({'error': f'Export is {job.status}'}), 409
+
+        _, extension, mimetype = WRITERS[job.format]
+        return send_file(
+            job.filepath,
+            mimetype=mimetype,
+            download_name=f'trades_export.{extension}',
+            as_attachment=True
+        )
@@ -0,0 +1,224 @@
+from sqlalchemy import select
+from models import db, Trade, ExportWatermark
+import csv
+import os
+import uuid
+
+
+# Rows fetched per round trip while exporting
+CHUNK_SIZE = 1000
+
+EXPORT_COLUMNS = [
+    Trade.id, Trade.timestamp, Trade.instrument, Trade.direction, Trade.entry, Trade.exit,
+    Trade.stop_loss, Trade.take_profit, Trade.size, Trade.risk, Trade.reward,
+    Trade.risk_currency, Trade.profit_loss, Trade.duration, Trade.comments,
+    # Trade.strategy, Trade.setup, Trade.mistakes, Trade.lessons
+]
+
+EXCEL_HEADERS = [
+    'ID', 'Timestamp', 'Instrument', 'Direction', 'Entry', 'Exit',
+    'Stop Loss', 'Take Profit', 'Size', 'Risk', 'Reward',
+    'Risk Currency', 'P/L', 'Duration', 'comments',
+    # 'Strategy', 'Setup', 'Mistakes', 'Lessons'
+]
+
+# Fixed column widths; measuring every cell would need the whole sheet in memory
+EXCEL_WIDTHS = [8, 21, 12, 11, 12, 12, 12, 13, 8, 10, 10, 14, 12, 11, 50]
+
+
+def export_rows(criteria=(), since_id=0):
+    """Yield export rows in id order, CHUNK_SIZE rows per query.
+
+    Each chunk is a separate keyset query on id, so no cursor stays open
+    between chunks and callers may commit while iterating.
+    """
+    last_id = since_id
+    while True:
+        chunk = db.session.execute(
+            select(*EXPORT_COLUMNS)
+            .where(*criteria)
+            .where(Trade.id > last_id)
+            .order_by(Trade.id)
+            .limit(CHUNK_SIZE)
+        ).all()
+        yield from chunk
+        if len(chunk) < CHUNK_SIZE:
+            return
+        last_id = chunk[-1].id
+
+
+def _tmp_path(path):
+    # Unique per writer, so concurrent exports to one path never share a file
+    return f"{path}.{uuid.uuid4().hex}.tmp"
+
+
+def _replace(tmp_path, path):
+    # Files are written next to the target and swapped in, so readers never see a partial file
+    os.replace(tmp_path, path)
+
+
+def _discard(tmp_path):
+    try:
+        os.remove(tmp_path)
+    except OSError:
+        pass
+
+
+def _report(progress, count):
+    if progress and count % CHUNK_SIZE == 0:
+        progress(count)
+
+
+def write_xlsx(path, rows, progress=None):
+    """Stream rows into a write-only workbook at path.
+
+    Rows are written straight to the file as they arrive, so memory does not
+    depend on the number of trades. progress(count) is called every CHUNK_SIZE
+    rows. Returns (row_count, last_row).
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, Alignment, PatternFill
+    from openpyxl.utils import get_column_letter
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Trade Journal")
+
+    for idx, width in enumerate(EXCEL_WIDTHS, start=1):
+        ws.column_dimensions[get_column_letter(idx)].width = width
+
+    header = []
+    for title in EXCEL_HEADERS:
+        cell = WriteOnlyCell(ws, value=title)
+        cell.fill = PatternFill(start_color='4F81BD', fill_type='solid')
+        cell.font = Font(color='FFFFFF', bold=True)
+        cell.alignment = Alignment(horizontal='center')
+        header.append(cell)
+    ws.append(header)
+
+    count = 0
+    last_row = None
+    for row in rows:
+        values = list(row)
+        values[1] = row.timestamp.strftime('%Y-%m-%d %H:%M:%S') if row.timestamp else None
+        ws.append(values)
+        count += 1
+        last_row = row
+        _report(progress, count)
+
+    tmp_path = _tmp_path(path)
+    try:
+        wb.save(tmp_path)
+    except BaseException:
+        _discard(tmp_path)
+        raise
+    _replace(tmp_path, path)
+    return count, last_row
+
+
+def write_csv(path, rows, progress=None):
+    """Stream rows into a CSV file; same columns and return value as write_xlsx"""
+    count = 0
+    last_row = None
+    tmp_path = _tmp_path(path)
+    try:
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(EXCEL_HEADERS)
+            for row in rows:
+                values = list(row)
+                values[1] = row.timestamp.strftime('%Y-%m-%d %H:%M:%S') if row.timestamp else None
+                writer.writerow(values)
+                count += 1
+                last_row = row
+                _report(progress, count)
+    except BaseException:
+        _discard(tmp_path)
+        raise
+    _replace(tmp_path, path)
+    return count, last_row
+
+
+def _arrow_schema(pa):
+    string_columns = {'instrument', 'direction', 'duration', 'comments'}
+    fields = []
+    for column in EXPORT_COLUMNS:
+        if column.key == 'id':
+            fields.append(pa.field(column.key, pa.int64()))
+        elif column.key == 'timestamp':
+            fields.append(pa.field(column.key, pa.timestamp('us')))
+        elif column.key in string_columns:
+            fields.append(pa.field(column.key, pa.string()))
+        else:
+            fields.append(pa.field(column.key, pa.float64()))
+    return pa.schema(fields)
+
+
+def _write_arrow(path, rows, progress, open_writer):
+    """Write rows as Arrow record batches of CHUNK_SIZE rows through open_writer(tmp_path, schema)"""
+    import pyarrow as pa
+
+    schema = _arrow_schema(pa)
+    count = 0
+    last_row = None
+    batch = []
+    tmp_path = _tmp_path(path)
+    writer = open_writer(tmp_path, schema)
+
+    def flush():
+        arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*batch), schema)]
+        writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+        batch.clear()
+
+    try:
+        try:
+            for row in rows:
+                batch.append(row)
+                count += 1
+                last_row = row
+                if len(batch) == CHUNK_SIZE:
+                    flush()
+                    _report(progress, count)
+            if batch:
+                flush()
+        finally:
+            writer.close()
+    except BaseException:
+        _discard(tmp_path)
+        raise
+    _replace(tmp_path, path)
+    return count, last_row
+
+
+def write_parquet(path, rows, progress=None):
+    """Stream rows into a Parquet file (requires pyarrow)"""
+    import pyarrow.parquet as pq
+    return _write_arrow(path, rows, progress, lambda p, schema: pq.ParquetWriter(p, schema))
+
+
+def write_feather(path, rows, progress=None):
+    """Stream rows into a Feather (Arrow IPC) file (requires pyarrow)"""
+    import pyarrow.ipc as ipc
+    return _write_arrow(path, rows, progress, lambda p, schema: ipc.new_file(p, schema))
+
+
+# Export format -> (writer, file extension, mimetype)
+WRITERS = {
+    'xlsx': (write_xlsx, 'xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'csv': (write_csv, 'csv', 'text/csv'),
+    'parquet': (write_parquet, 'parquet', 'application/vnd.apache.parquet'),
+    'feather': (write_feather, 'feather', 'application/vnd.apache.arrow.file'),
+}
+
+
+def get_watermark(name):
+    return db.session.get(ExportWatermark, name) or ExportWatermark(name=name, last_trade_id=0)
+
+
+def advance_watermark(watermark, last_row):
+    if last_row is None:
+        return
+    watermark.last_trade_id = max(watermark.last_trade_id or 0, last_row.id)
+    watermark.last_timestamp = last_row.timestamp
+    db.session.add(watermark)
+    db.session.commit()
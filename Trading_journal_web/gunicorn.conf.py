@@ -0,0 +1,33 @@
+"""gunicorn settings for wsgi:app, overridable from the environment"""
+import multiprocessing
+import os
+
+
+bind = os.environ.get('BIND', f"0.0.0.0:{os.environ.get('PORT', '8000')}")
+
+# One worker process per core by default, each serving requests on a
+# thread pool. Long-lived requests hold a thread (not a whole worker):
+# every /api/changes/stream client for as long as it stays connected, and
+# a screenshot ?size= request for up to 30 s while its thumbnail renders.
+# Size WEB_THREADS above the expected SSE clients per worker plus normal
+# request concurrency; once all threads are busy, new requests queue.
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'gthread'
+threads = int(os.environ.get('WEB_THREADS', 16))
+
+# gthread workers heartbeat from their main thread, so this only catches a
+# hung worker; it does not cut off a streaming response
+timeout = int(os.environ.get('WEB_TIMEOUT', 60))
+
+# Import and build the app once in the master; workers are forked from it
+# and start without importing anything
+preload_app = True
+
+
+def post_fork(server, worker):
+    # Connections opened in the master must not be shared with the workers
+    from wsgi import app
+    from models import db
+
+    with app.app_context():
+        db.engine.dispose(close=False)
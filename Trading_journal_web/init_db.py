@@ -1,5 +1,8 @@
-from app import app, db
-from models import Trade  # Import all your models
+# Same as `flask --app app init-db`
+from app import create_app
+from migrations import upgrade_database
+
+app = create_app()
 
 with app.app_context():
-    db.create_all()  # This creates all tables
+    upgrade_database()  # This creates all tables and indexes
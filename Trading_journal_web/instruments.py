@@ -0,0 +1,266 @@
+from flask import has_app_context
+from sqlalchemy import select, update
+from collections import namedtuple
+from functools import lru_cache
+from models import db, Trade, InstrumentSpec
+from changes import record_changes
+from versioning import bump_data_version
+import os
+import re
+import threading
+import time
+
+
+class Spec(namedtuple('Spec', 'pip_size contract_size quote_currency')):
+    @property
+    def pip_value(self):
+        """Value of one pip for 1.0 lot, in the quote currency"""
+        return self.pip_size * self.contract_size
+
+
+CURRENCIES = ("USD", "EUR", "GBP", "JPY", "AUD", "NZD", "CAD", "CHF", "PLN")
+
+# Metals use their standard contracts, index CFDs the xStation5 (XTB)
+# value per point; anything else goes in the InstrumentSpec table
+# (`flask set-instrument-spec`) or falls back to DEFAULT_SPEC.
+BUILTIN_SPECS = {
+    'GOLD': Spec(0.01, 100.0, 'USD'),
+    'XAUUSD': Spec(0.01, 100.0, 'USD'),
+    'SILVER': Spec(0.001, 5000.0, 'USD'),
+    'XAGUSD': Spec(0.001, 5000.0, 'USD'),
+    'US100': Spec(1.0, 20.0, 'USD'),
+    'US500': Spec(1.0, 50.0, 'USD'),
+    'US30': Spec(1.0, 5.0, 'USD'),
+    'DE40': Spec(1.0, 25.0, 'EUR'),
+    'DE30': Spec(1.0, 25.0, 'EUR'),
+    'UK100': Spec(1.0, 10.0, 'GBP'),
+}
+
+# Points x lots, in no particular currency
+DEFAULT_SPEC = Spec(1.0, 1.0, None)
+
+
+def _parse_rates(text):
+    """'USD=3.95,EUR=4.28' -> {'USD': 3.95, 'EUR': 4.28}"""
+    rates = {}
+    for item in filter(None, (part.strip() for part in text.split(','))):
+        currency, _, rate = item.partition('=')
+        rates[currency.strip().upper()] = float(rate)
+    return rates
+
+
+# Currency the broker books P/L in, and account currency per unit of other
+# currencies. Amounts that can't be converted stay in the quote currency.
+ACCOUNT_CURRENCY = (os.environ.get('ACCOUNT_CURRENCY') or '').upper() or None
+FX_RATES = _parse_rates(os.environ.get('FX_RATES') or '')
+
+# Registry rows are reloaded after this long, so edits made by other
+# processes are picked up
+SPEC_CACHE_SECONDS = 60
+
+RECOMPUTE_BATCH_SIZE = 50000
+
+# EURUSD, GBPJPY, EURUSD.pro, ...
+_PAIR_RE = re.compile(r'([A-Z]{3})([A-Z]{3})(?![A-Z])')
+
+_registry = {'specs': None, 'loaded_at': 0.0}
+_registry_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1024)
+def currency_pair(symbol):
+    """(base, quote) for FX pairs like EURUSD or EURUSD.pro, else None"""
+    match = _PAIR_RE.match(symbol.upper())
+    if match and match.group(1) in CURRENCIES and match.group(2) in CURRENCIES:
+        return match.group(1), match.group(2)
+    return None
+
+
+@lru_cache(maxsize=1024)
+def default_spec(symbol):
+    """Spec for a symbol without a registry row; instruments repeat a lot, so cache"""
+    upper = symbol.upper()
+    if upper in BUILTIN_SPECS:
+        return BUILTIN_SPECS[upper]
+    pair = currency_pair(upper)
+    if pair:
+        return Spec(0.01 if pair[1] == 'JPY' else 0.0001, 100000.0, pair[1])
+    return DEFAULT_SPEC
+
+
+def registered_specs():
+    """InstrumentSpec rows by symbol, cached in memory for SPEC_CACHE_SECONDS.
+
+    Outside an app context (e.g. the parser benchmark) the registry is empty.
+    """
+    if not has_app_context():
+        return {}
+    with _registry_lock:
+        if _registry['specs'] is None or time.monotonic() - _registry['loaded_at'] > SPEC_CACHE_SECONDS:
+            _registry['specs'] = {
+                row.symbol: Spec(row.pip_size, row.contract_size, row.quote_currency)
+                for row in db.session.scalars(select(InstrumentSpec))
+            }
+            _registry['loaded_at'] = time.monotonic()
+        return _registry['specs']
+
+
+def invalidate_specs():
+    with _registry_lock:
+        _registry['specs'] = None
+
+
+def spec_for(symbol):
+    """Registry row, built-in or default spec for a symbol"""
+    symbol = symbol or ''
+    return registered_specs().get(symbol.upper()) or default_spec(symbol)
+
+
+def set_spec(symbol, pip_size, contract_size, quote_currency=None):
+    """Add or replace a registry row (commits)"""
+    symbol = symbol.strip().upper()
+    row = db.session.get(InstrumentSpec, symbol) or InstrumentSpec(symbol=symbol)
+    row.pip_size = pip_size
+    row.contract_size = contract_size
+    row.quote_currency = quote_currency.upper() if quote_currency else None
+    db.session.add(row)
+    db.session.commit()
+    invalidate_specs()
+
+
+def quote_rate(quote_currency):
+    """Account currency per unit of quote_currency from the configuration, or None"""
+    if not ACCOUNT_CURRENCY or not quote_currency:
+        return None
+    if quote_currency == ACCOUNT_CURRENCY:
+        return 1.0
+    return FX_RATES.get(quote_currency)
+
+
+def base_is_account(symbol):
+    """Whether symbol is an FX pair with the account currency as its base (e.g. PLN in PLNJPY)"""
+    pair = currency_pair(symbol)
+    return bool(ACCOUNT_CURRENCY and pair and pair[0] == ACCOUNT_CURRENCY)
+
+
+def risk_reward(symbol, direction, entry, stop_loss, take_profit, size):
+    """(risk, reward, currency) from the levels and the instrument spec.
+
+    Amounts are pip moves x pip value x size, converted to ACCOUNT_CURRENCY
+    when the rate is known (quote_rate, or 1 / entry for pairs based on the
+    account currency) and otherwise left in the spec's quote currency;
+    currency is None for specs without one. None without full levels.
+    """
+    if not all([entry, stop_loss, take_profit, size]):
+        return None
+    side = _side(direction)
+    if not side:
+        return None
+    symbol = symbol or ''
+    spec = spec_for(symbol)
+    rate = 1.0 / entry if base_is_account(symbol) else quote_rate(spec.quote_currency)
+    currency = ACCOUNT_CURRENCY if rate is not None else spec.quote_currency
+    lot_value = spec.pip_value * size * (rate if rate is not None else 1.0)
+    risk = side * (entry - stop_loss) / spec.pip_size * lot_value
+    reward = side * (take_profit - entry) / spec.pip_size * lot_value
+    return round(risk, 2), round(reward, 2), currency
+
+
+def _side(direction):
+    direction = (direction or '').lower()
+    if direction in ('long', 'buy'):
+        return 1
+    if direction in ('short', 'sell'):
+        return -1
+    return 0
+
+
+def _recompute_batch(rows):
+    """Vectorized risk/reward (and r_multiple) for one batch; returns the changed rows"""
+    import numpy as np
+
+    ids, instruments, directions, entry, stop_loss, take_profit, size, profit_loss, old_risk, old_reward, old_currency = zip(*rows)
+
+    def floats(values):
+        return np.array([np.nan if v is None else v for v in values], dtype=float)
+
+    entry, stop_loss, take_profit, size = map(floats, (entry, stop_loss, take_profit, size))
+    profit_loss, old_risk, old_reward = map(floats, (profit_loss, old_risk, old_reward))
+
+    # One spec and rate lookup per distinct symbol, as in risk_reward()
+    symbols, inverse = np.unique(np.array([s or '' for s in instruments], dtype=object), return_inverse=True)
+    specs = [spec_for(symbol) for symbol in symbols]
+    pip_size = np.array([spec.pip_size for spec in specs])[inverse]
+    pip_value = np.array([spec.pip_value for spec in specs])[inverse]
+    quote = np.array([spec.quote_currency for spec in specs], dtype=object)[inverse]
+    fixed_rate = np.array([quote_rate(spec.quote_currency) or np.nan for spec in specs])[inverse]
+    base = np.array([base_is_account(symbol) for symbol in symbols], dtype=bool)[inverse]
+    side = np.array([_side(direction) for direction in directions], dtype=float)
+
+    levels = np.stack([entry, stop_loss, take_profit, size])
+    complete = np.all(np.nan_to_num(levels) != 0, axis=0) & (side != 0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = np.where(base, 1.0 / entry, fixed_rate)
+    converted = ~np.isnan(rate)
+    currency = np.where(converted, ACCOUNT_CURRENCY, quote)
+
+    lot_value = pip_value * size * np.where(converted, rate, 1.0)
+    risk = np.round(side * (entry - stop_loss) / pip_size * lot_value, 2)
+    reward = np.round(side * (take_profit - entry) / pip_size * lot_value, 2)
+
+    def differs(new, old):
+        return ~((new == old) | (np.isnan(new) & np.isnan(old)))
+
+    changed = complete & (
+        differs(risk, old_risk) | differs(reward, old_reward) | (currency != np.array(old_currency, dtype=object))
+    )
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r_multiple = np.where((risk > 0) & ~np.isnan(profit_loss), profit_loss / risk, np.nan)
+
+    def value(array, i):
+        return None if np.isnan(array[i]) else float(array[i])
+
+    return [
+        {
+            'id': ids[i], 'risk': value(risk, i), 'reward': value(reward, i),
+            'risk_currency': currency[i], 'r_multiple': value(r_multiple, i),
+        }
+        for i in np.flatnonzero(changed)
+    ]
+
+
+def recompute_risk_reward(instruments=None):
+    """Recompute risk, reward and r_multiple of the stored trades from their levels and the specs.
+
+    Trades without entry, stop loss, take profit and size keep their values.
+    Works in id-ordered batches of RECOMPUTE_BATCH_SIZE with bulk updates and
+    commits once; returns (trades checked, trades updated).
+    """
+    invalidate_specs()
+    columns = (
+        Trade.id, Trade.instrument, Trade.direction, Trade.entry, Trade.stop_loss, Trade.take_profit,
+        Trade.size, Trade.profit_loss, Trade.risk, Trade.reward, Trade.risk_currency,
+    )
+    checked = 0
+    updated_ids = []
+    last_id = 0
+    while True:
+        stmt = select(*columns).where(Trade.id > last_id).order_by(Trade.id).limit(RECOMPUTE_BATCH_SIZE)
+        if instruments:
+            stmt = stmt.where(Trade.instrument.in_(instruments))
+        rows = db.session.execute(stmt).all()
+        if not rows:
+            break
+        changed = _recompute_batch(rows)
+        if changed:
+            db.session.execute(update(Trade), changed)
+            updated_ids.extend(row['id'] for row in changed)
+        checked += len(rows)
+        last_id = rows[-1].id
+
+    if updated_ids:
+        bump_data_version()
+        record_changes(updated_ids, 'update')
+    db.session.commit()
+    return checked, len(updated_ids)
@@ -0,0 +1,211 @@
+from flask import request, g, current_app, has_request_context
+from sqlalchemy import event
+from models import db
+from collections import defaultdict
+import bisect
+import io
+import logging
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+SIZE_BUCKETS = [256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304]
+QUERY_COUNT_BUCKETS = [0, 1, 2, 3, 5, 10, 20, 50, 100]
+
+PROFILE_TOP_FUNCTIONS = 50
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets + ['+Inf'], self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_sum{{{labels}}} {self.sum}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+
+class Metrics:
+    """Per-process request and SQL statistics"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+        self.response_size = defaultdict(lambda: Histogram(SIZE_BUCKETS))
+        self.query_count = defaultdict(lambda: Histogram(QUERY_COUNT_BUCKETS))
+        self.query_seconds = defaultdict(float)
+        self.requests = defaultdict(int)
+        self.slow_queries = 0
+
+    def record_request(self, endpoint, method, status, seconds, size, queries, query_seconds):
+        key = (endpoint, method)
+        with self._lock:
+            self.latency[key].observe(seconds)
+            if size is not None:
+                self.response_size[key].observe(size)
+            self.query_count[key].observe(queries)
+            self.query_seconds[key] += query_seconds
+            self.requests[(endpoint, method, status)] += 1
+
+    def record_slow_query(self):
+        with self._lock:
+            self.slow_queries += 1
+
+    def render(self, extra=()):
+        """Prometheus text exposition format"""
+        with self._lock:
+            lines = [
+                '# HELP http_request_duration_seconds Request latency by endpoint.',
+                '# TYPE http_request_duration_seconds histogram',
+            ]
+            for (endpoint, method), histogram in sorted(self.latency.items()):
+                lines.extend(histogram.lines('http_request_duration_seconds', _labels(endpoint=endpoint, method=method)))
+
+            lines += [
+                '# HELP http_response_size_bytes Response body size by endpoint (streamed responses excluded).',
+                '# TYPE http_response_size_bytes histogram',
+            ]
+            for (endpoint, method), histogram in sorted(self.response_size.items()):
+                lines.extend(histogram.lines('http_response_size_bytes', _labels(endpoint=endpoint, method=method)))
+
+            lines += [
+                '# HELP http_requests_total Requests by endpoint and status.',
+                '# TYPE http_requests_total counter',
+            ]
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                lines.append(f'http_requests_total{{{_labels(endpoint=endpoint, method=method, status=status)}}} {count}')
+
+            lines += [
+                '# HELP db_queries_per_request SQL statements executed per request.',
+                '# TYPE db_queries_per_request histogram',
+            ]
+            for (endpoint, method), histogram in sorted(self.query_count.items()):
+                lines.extend(histogram.lines('db_queries_per_request', _labels(endpoint=endpoint, method=method)))
+
+            lines += [
+                '# HELP db_query_seconds_total Time spent in SQL statements by endpoint.',
+                '# TYPE db_query_seconds_total counter',
+            ]
+            for (endpoint, method), seconds in sorted(self.query_seconds.items()):
+                lines.append(f'db_query_seconds_total{{{_labels(endpoint=endpoint, method=method)}}} {seconds}')
+
+            lines += [
+                '# HELP db_slow_queries_total SQL statements slower than SLOW_QUERY_MS.',
+                '# TYPE db_slow_queries_total counter',
+                f'db_slow_queries_total {self.slow_queries}',
+            ]
+        lines.extend(extra)
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(**labels):
+    return ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+        for name, value in labels.items()
+    )
+
+
+def _cache_lines(app):
+    cache = app.extensions.get('response_cache')
+    if cache is None:
+        return []
+    return [
+        '# TYPE response_cache_hits_total counter',
+        f'response_cache_hits_total {cache.hits}',
+        '# TYPE response_cache_misses_total counter',
+        f'response_cache_misses_total {cache.misses}',
+        '# TYPE response_cache_bytes gauge',
+        f'response_cache_bytes {cache.size}',
+    ]
+
+
+def _profile_report(profiler):
+    import pstats
+
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out)
+    stats.sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+    return out.getvalue()
+
+
+def init_metrics(app):
+    """Record latency, response size and SQL statements of every request.
+
+    With PROFILE_REQUESTS enabled, ?profile=1 answers any request with its
+    cProfile report instead of the normal response.
+    """
+    metrics = Metrics()
+    app.extensions['metrics'] = metrics
+    slow_query_seconds = app.config.get('SLOW_QUERY_MS', 200) / 1000
+
+    # The start time lives on the execution context, so a statement that
+    # raises leaves nothing behind on the pooled connection
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._query_start = time.perf_counter()
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, '_query_start', None)
+        if start is None:
+            return
+        elapsed = time.perf_counter() - start
+        if has_request_context():
+            g.query_count = g.get('query_count', 0) + 1
+            g.query_seconds = g.get('query_seconds', 0.0) + elapsed
+        if elapsed >= slow_query_seconds:
+            metrics.record_slow_query()
+            logger.warning("Slow query (%.0f ms): %s", elapsed * 1000, ' '.join(statement.split())[:500])
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(db.engine, 'after_cursor_execute', after_cursor_execute)
+
+    @app.before_request
+    def start_request_timer():
+        g.request_start = time.perf_counter()
+        if app.config.get('PROFILE_REQUESTS') and request.args.get('profile'):
+            import cProfile
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    @app.after_request
+    def record_request(response):
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            response = current_app.response_class(_profile_report(profiler), mimetype='text/plain')
+
+        start = g.get('request_start')
+        if start is not None:
+            metrics.record_request(
+                request.url_rule.rule if request.url_rule else 'unmatched',
+                request.method,
+                response.status_code,
+                time.perf_counter() - start,
+                None if response.is_streamed else response.calculate_content_length(),
+                g.get('query_count', 0),
+                g.get('query_seconds', 0.0),
+            )
+        return response
+
+    # Prometheus scrape endpoint (per process)
+    @app.route('/api/metrics', methods=['GET'])
+    def get_metrics():
+        return current_app.response_class(
+            metrics.render(_cache_lines(app)),
+            mimetype='text/plain; version=0.0.4',
+        )
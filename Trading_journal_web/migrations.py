@@ -0,0 +1,66 @@
+from sqlalchemy import inspect, text
+from models import db, Trade, DailyStats, DataVersion
+from rollups import rebuild_rollups
+from trade_metrics import DERIVED_COLUMNS, backfill_derived
+from versioning import bump_data_version
+from search import create_search_index
+
+
+def add_missing_columns():
+    """ALTER TABLE ... ADD COLUMN for model columns missing from existing tables.
+
+    New columns must be nullable (or have a server default). Returns the
+    added columns as (table, column) pairs.
+    """
+    inspector = inspect(db.engine)
+    preparer = db.engine.dialect.identifier_preparer
+    added = []
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                connection.execute(text(
+                    f"ALTER TABLE {preparer.quote(table.name)} "
+                    f"ADD COLUMN {preparer.quote(column.name)} {column_type}"
+                ))
+                added.append((table.name, column.name))
+    return added
+
+
+def upgrade_database():
+    """Create missing tables, columns and indexes.
+
+    db.create_all() only adds indexes together with brand new tables, so indexes
+    declared later on existing tables are created here explicitly, as are new
+    columns. Rollup tables added to an existing database are filled from the
+    trade table, newly added derived trade columns are backfilled and the
+    comment search index is built on first run.
+    """
+    had_rollups = inspect(db.engine).has_table(DailyStats.__tablename__)
+
+    db.create_all()
+    added = add_missing_columns()
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+    if not had_rollups:
+        rebuild_rollups()
+
+    if any(table == Trade.__tablename__ and column in DERIVED_COLUMNS for table, column in added):
+        backfill_derived()
+
+    create_search_index()
+
+    if db.session.get(DataVersion, 1) is None:
+        db.session.add(DataVersion(id=1, version=0))
+        db.session.commit()
+    elif added:
+        # Serialized trades change shape with new columns; invalidate client ETags
+        bump_data_version()
+        db.session.commit()
@@ -1,5 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+import json
 
 db = SQLAlchemy()
 
@@ -15,18 +16,165 @@ class Trade(db.Model):
     size = db.Column(db.Float)
     risk = db.Column(db.Float)
     reward = db.Column(db.Float)
+    risk_currency = db.Column(db.String(3))  # currency of risk and reward, None if unknown
     profit_loss = db.Column(db.Float)
     duration = db.Column(db.String(20))
     comments = db.Column(db.Text)
+    # Typed values for SQL aggregates; the last three are derived from the
+    # fields above by trade_metrics.apply_derived
+    open_time = db.Column(db.DateTime)
+    close_time = db.Column(db.DateTime)
+    duration_seconds = db.Column(db.Integer)
+    r_multiple = db.Column(db.Float)
+    outcome = db.Column(db.String(10))
     # strategy = db.Column(db.String(100))
     # setup = db.Column(db.Text)
     # mistakes = db.Column(db.Text)
     # lessons = db.Column(db.Text)
     screenshots = db.relationship('Screenshot', backref='trade', lazy=True)
 
+    __table_args__ = (
+        # Keyset pagination walks (timestamp, id) newest first; the filter indexes
+        # end with the same keys so filtered pages are served in index order too
+        db.Index('ix_trade_timestamp_id', 'timestamp', 'id'),
+        db.Index('ix_trade_instrument_timestamp_id', 'instrument', 'timestamp', 'id'),
+        db.Index('ix_trade_direction_timestamp_id', 'direction', 'timestamp', 'id'),
+        db.Index('ix_trade_profit_loss', 'profit_loss'),
+        db.Index('ix_trade_outcome_timestamp_id', 'outcome', 'timestamp', 'id'),
+        db.Index('ix_trade_duration_seconds', 'duration_seconds'),
+        db.Index('ix_trade_r_multiple', 'r_multiple'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'timestamp': self.timestamp.isoformat(),
+            'instrument': self.instrument,
+            'direction': self.direction,
+            'entry': self.entry,
+            'exit': self.exit,
+            'stop_loss': self.stop_loss,
+            'take_profit': self.take_profit,
+            'size': self.size,
+            'risk': self.risk,
+            'reward': self.reward,
+            'risk_currency': self.risk_currency,
+            'profit_loss': self.profit_loss,
+            'duration': self.duration,
+            'comments': self.comments,
+            'open_time': self.open_time.isoformat() if self.open_time else None,
+            'close_time': self.close_time.isoformat() if self.close_time else None,
+            'duration_seconds': self.duration_seconds,
+            'r_multiple': self.r_multiple,
+            'outcome': self.outcome,
+            # 'strategy': self.strategy,
+            # 'setup': self.setup,
+            # 'mistakes': self.mistakes,
+            # 'lessons': self.lessons,
+            'screenshots': [{'id': s.id, 'filename': s.filename} for s in self.screenshots]
+        }
+
 class Screenshot(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    filename = db.Column(db.String(255))
+    # Content-addressed (<sha256><ext>); rows sharing a filename share the file
+    filename = db.Column(db.String(255), index=True)
     filepath = db.Column(db.String(255))
     upload_date = db.Column(db.DateTime, default=datetime.utcnow)
-    trade_id = db.Column(db.Integer, db.ForeignKey('trade.id'), nullable=False)
\ No newline at end of file
+    trade_id = db.Column(db.Integer, db.ForeignKey('trade.id'), nullable=False, index=True)
+
+
+# Rollup tables for the dashboard summary. They are updated with deltas in the
+# same transaction as every trade write (see rollups.py) and can be rebuilt
+# from the trade table with `flask rebuild-rollups`.
+class DailyStats(db.Model):
+    date = db.Column(db.Date, primary_key=True)
+    trade_count = db.Column(db.Integer, nullable=False, default=0)
+    win_count = db.Column(db.Integer, nullable=False, default=0)
+    loss_count = db.Column(db.Integer, nullable=False, default=0)
+    total_profit = db.Column(db.Float, nullable=False, default=0.0)
+    gross_profit = db.Column(db.Float, nullable=False, default=0.0)
+    gross_loss = db.Column(db.Float, nullable=False, default=0.0)
+
+
+class InstrumentStats(db.Model):
+    instrument = db.Column(db.String(20), primary_key=True)
+    direction = db.Column(db.String(10), primary_key=True)
+    trade_count = db.Column(db.Integer, nullable=False, default=0)
+    win_count = db.Column(db.Integer, nullable=False, default=0)
+    loss_count = db.Column(db.Integer, nullable=False, default=0)
+    total_profit = db.Column(db.Float, nullable=False, default=0.0)
+    gross_profit = db.Column(db.Float, nullable=False, default=0.0)
+    gross_loss = db.Column(db.Float, nullable=False, default=0.0)
+
+
+# Last trade written by each export, so incremental exports know where to resume
+class ExportWatermark(db.Model):
+    name = db.Column(db.String(50), primary_key=True)
+    last_trade_id = db.Column(db.Integer, nullable=False, default=0)
+    last_timestamp = db.Column(db.DateTime)
+    exported_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+# Per-instrument contract details for risk/reward; symbols not listed here use
+# the defaults in instruments.py
+class InstrumentSpec(db.Model):
+    symbol = db.Column(db.String(50), primary_key=True)  # upper case
+    pip_size = db.Column(db.Float, nullable=False)
+    contract_size = db.Column(db.Float, nullable=False)  # units per 1.0 lot
+    quote_currency = db.Column(db.String(3))
+
+
+# Single-row counter bumped by every write, used to key caches of derived data
+class DataVersion(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+# Append-only log of trade changes; the id is the sync cursor of /api/changes.
+# Screenshot changes are logged as updates of their trade.
+class TradeChange(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    trade_id = db.Column(db.Integer, nullable=False)
+    action = db.Column(db.String(10), nullable=False)  # create, update or delete
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # AUTOINCREMENT so ids are never reused once old entries are pruned
+    __table_args__ = {'sqlite_autoincrement': True}
+
+
+class ExportJob(db.Model):
+    id = db.Column(db.String(32), primary_key=True)
+    format = db.Column(db.String(10), nullable=False)
+    filters = db.Column(db.Text, nullable=False, default='{}')
+    data_version = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(10), nullable=False, default='queued')
+    total_rows = db.Column(db.Integer)
+    rows_written = db.Column(db.Integer, nullable=False, default=0)
+    filepath = db.Column(db.String(255))
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    # Heartbeat: every status or progress write moves it forward
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # "host:pid" of the process whose pool runs the job
+    owner = db.Column(db.String(64))
+
+    __table_args__ = (
+        # Finished artifacts are looked up by (format, filters, data version)
+        db.Index('ix_export_job_cache_key', 'format', 'filters', 'data_version'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'format': self.format,
+            'filters': json.loads(self.filters),
+            'data_version': self.data_version,
+            'status': self.status,
+            'total_rows': self.total_rows,
+            'rows_written': self.rows_written,
+            'progress': self.rows_written / self.total_rows if self.total_rows else (1.0 if self.status == 'finished' else 0.0),
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
@@ -0,0 +1,198 @@
+from instruments import risk_reward
+from datetime import datetime
+import logging
+import re
+
+
+logger = logging.getLogger(__name__)
+
+# Broker name -> BrokerParser
+BROKER_PARSERS = {}
+
+
+class BrokerParser:
+    def __init__(self, parse, split, parse_batch=None):
+        self.parse = parse
+        self.split = split
+        self.parse_batch = parse_batch or (lambda text: [parse(block) for block in split(text)])
+
+
+def register_parser(name, split, parse_batch=None):
+    """Register a statement parser for a broker format under name.
+
+    split(text) cuts concatenated statements into single ones; parse_batch(text)
+    may be given when the format can parse many statements more cheaply at once.
+    """
+    def decorator(parse):
+        BROKER_PARSERS[name] = BrokerParser(parse, split, parse_batch)
+        return parse
+    return decorator
+
+
+def parse_float(value):
+    """Convert localized float like '18 939.71' to float 18939.71"""
+    try:
+        return float(value.replace(" ", "").replace(",", "."))
+    except (AttributeError, ValueError):
+        return 0.0
+
+
+def calculate_risk_reward(trade):
+    """Fill trade['risk'] / trade['reward'] from entry, stop loss, take profit and size.
+
+    Amounts use the instrument's pip size and contract size from the
+    instrument registry; trade['risk_currency'] says which currency they are
+    in (see instruments.risk_reward).
+    """
+    try:
+        values = risk_reward(
+            trade.get("instrument", ""),
+            trade.get("direction", ""),
+            trade.get("entry", 0),
+            trade.get("stop_loss", 0),
+            trade.get("take_profit", 0),
+            trade.get("size", 0),
+        )
+        if values is not None:
+            trade["risk"], trade["reward"], trade["risk_currency"] = values
+    except Exception as e:
+        logger.warning("Error calculating risk/reward: %s", e)
+        trade["risk"] = 0
+        trade["reward"] = 0
+
+
+# xStation5 ---------------------------------------------------------------
+
+XSTATION5_BLOCK_START = "Szczegóły pozycji"
+XSTATION5_TIME_FORMAT = "%d.%m.%Y %H:%M"
+
+# Fast path for the usual "dd.mm.yyyy HH:MM"; anything else goes through strptime
+_XSTATION5_TIME_RE = re.compile(r'(\d{1,2})\.(\d{1,2})\.(\d{4}) (\d{1,2}):(\d{2})')
+
+
+def _xstation5_direction(value):
+    return "long" if value.lower() == "buy" else "short"
+
+
+def _xstation5_time(value):
+    match = _XSTATION5_TIME_RE.fullmatch(value)
+    if match is None:
+        return datetime.strptime(value, XSTATION5_TIME_FORMAT)
+    day, month, year, hour, minute = map(int, match.groups())
+    return datetime(year, month, day, hour, minute)
+
+
+# Label -> (trade key, converter); a label's value is on the following line
+XSTATION5_FIELDS = {
+    "Typ": ("direction", _xstation5_direction),
+    "Wolumen": ("size", parse_float),
+    "Zysk netto": ("profit_loss", parse_float),
+    "Cena otwarcia": ("entry", parse_float),
+    "Cena zamknięcia": ("exit", parse_float),
+    "Stop Loss": ("stop_loss", parse_float),
+    "Take Profit": ("take_profit", parse_float),
+}
+
+# Label -> trade key; the value is a date line followed by a time line
+XSTATION5_TIMES = {
+    "Czas otwarcia": "open_time",
+    "Czas zamknięcia": "close_time",
+}
+
+
+def _clean_lines(text):
+    return [line for line in map(str.strip, text.splitlines()) if line]
+
+
+def _split_lines(lines):
+    """Yield one line list per position; text before the first header stays with it"""
+    start = 0
+    seen_header = False
+    for i, line in enumerate(lines):
+        if line == XSTATION5_BLOCK_START:
+            if seen_header:
+                yield lines[start:i]
+                start = i
+            seen_header = True
+    if start < len(lines):
+        yield lines[start:]
+
+
+def split_xstation5(text):
+    """Split concatenated xStation5 clipboard copies into one block per position"""
+    return ['\n'.join(block) for block in _split_lines(_clean_lines(text))]
+
+
+def _parse_xstation5_lines(lines):
+    count = len(lines)
+
+    # Instrument is the first line after the "Szczegóły pozycji" header
+    trade = {"instrument": ""}
+    instrument_found = False
+
+    i = 0
+    while i < count:
+        line = lines[i]
+        field = XSTATION5_FIELDS.get(line)
+        if field is not None:
+            key, convert = field
+            trade[key] = convert(lines[i + 1] if i + 1 < count else "")
+            i += 2
+            continue
+
+        time_key = XSTATION5_TIMES.get(line)
+        if time_key is not None:
+            if i + 2 < count:
+                trade[time_key] = f"{lines[i + 1]} {lines[i + 2]}"
+                i += 3
+            else:
+                i += 1
+            continue
+
+        if line == XSTATION5_BLOCK_START and not instrument_found:
+            instrument_found = True
+            if i + 1 < count:
+                trade["instrument"] = lines[i + 1]
+        i += 1
+
+    # Calculate duration
+    if "open_time" in trade and "close_time" in trade:
+        try:
+            t1 = _xstation5_time(trade["open_time"])
+            t2 = _xstation5_time(trade["close_time"])
+            mins = int((t2 - t1).total_seconds() // 60)
+            trade["duration"] = f"{mins} min"
+        except ValueError:
+            trade["duration"] = ""
+
+    calculate_risk_reward(trade)
+    return trade
+
+
+def parse_xstation5_batch(text):
+    """Parse concatenated xStation5 copies, splitting the text into lines only once"""
+    return [_parse_xstation5_lines(block) for block in _split_lines(_clean_lines(text))]
+
+
+@register_parser('xstation5', split_xstation5, parse_xstation5_batch)
+def parse_xstation5(text):
+    """Parse one xStation5 "position details" clipboard copy into a trade dict"""
+    return _parse_xstation5_lines(_clean_lines(text))
+
+
+# Public API ---------------------------------------------------------------
+
+def get_parser(broker):
+    try:
+        return BROKER_PARSERS[broker]
+    except KeyError:
+        raise ValueError(f"Unknown broker format: {broker}")
+
+
+def parse_statement(text, broker='xstation5'):
+    return get_parser(broker).parse(text)
+
+
+def parse_statements(text, broker='xstation5'):
+    """Parse many concatenated statements of one broker format in a single pass"""
+    return get_parser(broker).parse_batch(text)
@@ -0,0 +1,123 @@
+from sqlalchemy import tuple_
+from models import Trade
+from datetime import datetime, timedelta
+import base64
+
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Query parameters read by trade_filters
+FILTER_ARGS = ('instrument', 'direction', 'start_date', 'end_date', 'outcome')
+
+
+def _parse_date(value):
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid date: {value}")
+
+
+def _split_values(args, name):
+    values = []
+    for raw in args.getlist(name):
+        values.extend(v.strip() for v in raw.split(',') if v.strip())
+    return values
+
+
+def trade_filters(args):
+    """Build SQLAlchemy criteria for the trade filters shared by list and analytics endpoints.
+
+    Supported query parameters: instrument (repeatable or comma separated), direction
+    (long/short), start_date / end_date (ISO dates, end_date inclusive) and
+    outcome (win/loss/breakeven, i.e. the sign of profit_loss).
+    Raises ValueError on malformed input.
+    """
+    criteria = []
+
+    instruments = _split_values(args, 'instrument')
+    if instruments:
+        criteria.append(Trade.instrument.in_(instruments))
+
+    direction = args.get('direction', '').strip().lower()
+    if direction:
+        if direction not in ('long', 'short'):
+            raise ValueError(f"Invalid direction: {direction}")
+        # Stored values come from both the form ("Long") and the parser ("long");
+        # matching the spellings explicitly keeps the direction index usable
+        criteria.append(Trade.direction.in_([direction, direction.capitalize(), direction.upper()]))
+
+    start_date = args.get('start_date', '').strip()
+    if start_date:
+        criteria.append(Trade.timestamp >= _parse_date(start_date))
+
+    end_date = args.get('end_date', '').strip()
+    if end_date:
+        if len(end_date) == 10:
+            # A bare date covers the whole day
+            criteria.append(Trade.timestamp < _parse_date(end_date) + timedelta(days=1))
+        else:
+            criteria.append(Trade.timestamp <= _parse_date(end_date))
+
+    outcome = args.get('outcome', '').strip().lower()
+    if outcome:
+        if outcome not in ('win', 'loss', 'breakeven'):
+            raise ValueError(f"Invalid outcome: {outcome}")
+        criteria.append(Trade.outcome == outcome)
+
+    return criteria
+
+
+def encode_cursor(trade):
+    raw = f"{trade.timestamp.isoformat()}|{trade.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, trade_id = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        return datetime.fromisoformat(timestamp), int(trade_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def page_size(args):
+    """Return the requested page size, or None when the caller wants the full listing"""
+    limit = args.get('limit')
+    if limit is None:
+        return DEFAULT_PAGE_SIZE if args.get('cursor') else None
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise ValueError(f"Invalid limit: {limit}")
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def keyset_query(query, args):
+    """Order newest first on (timestamp, id) and start after ?cursor= if given"""
+    query = query.order_by(Trade.timestamp.desc(), Trade.id.desc())
+
+    cursor = args.get('cursor')
+    if cursor:
+        timestamp, trade_id = decode_cursor(cursor)
+        query = query.filter(tuple_(Trade.timestamp, Trade.id) < (timestamp, trade_id))
+    return query
+
+
+def paginate_trades(query, args):
+    """Apply newest-first keyset pagination on (timestamp, id).
+
+    Returns (trades, next_cursor); next_cursor is None on the last page.
+    """
+    query = keyset_query(query, args)
+
+    limit = page_size(args)
+    if limit is None:
+        return query.all(), None
+
+    trades = query.limit(limit + 1).all()
+    if len(trades) > limit:
+        trades = trades[:limit]
+        return trades, encode_cursor(trades[-1])
+    return trades, None
@@ -0,0 +1,105 @@
+from flask import request, current_app
+from collections import OrderedDict
+from functools import wraps
+from versioning import current_data_version
+import hashlib
+import threading
+
+
+# Response headers replayed from the cache besides the body and content type
+CACHED_HEADERS = ('X-Next-Cursor',)
+
+
+class ResponseCache:
+    """LRU of serialized responses, bounded by the total size of the bodies.
+
+    Entries of an older data version can never be hit again, so they are
+    dropped as soon as a newer version is stored.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, version, key, entry):
+        body = entry[0]
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if self.version is None or version > self.version:
+                self._entries.clear()
+                self.size = 0
+                self.version = version
+            elif version < self.version:
+                return
+
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous[0])
+            self._entries[key] = entry
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted[0])
+
+
+def init_response_cache(app):
+    app.extensions['response_cache'] = ResponseCache(app.config.get('RESPONSE_CACHE_BYTES', 32 * 1024 * 1024))
+
+
+def versioned(view):
+    """Serve a GET view with an ETag tied to the data version.
+
+    A matching If-None-Match gets a 304 without running the view; otherwise
+    the serialized response is reused from the in-process LRU while the data
+    version (bumped by every write) is unchanged. Streamed and non-200
+    responses pass through uncached.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        version = current_data_version()
+        key = (
+            request.endpoint,
+            tuple(sorted(kwargs.items())),
+            tuple(sorted(request.args.items(multi=True))),
+            request.headers.get('Accept', ''),
+            version,
+        )
+        etag = f"{version}-{hashlib.sha1(repr(key).encode()).hexdigest()[:16]}"
+
+        if request.if_none_match.contains(etag):
+            response = current_app.response_class(status=304)
+        else:
+            cache = current_app.extensions['response_cache']
+            entry = cache.get(key)
+            if entry is None:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                headers = {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers}
+                cache.put(version, key, (response.get_data(), response.mimetype, headers))
+            else:
+                body, mimetype, headers = entry
+                response = current_app.response_class(body, mimetype=mimetype, headers=headers)
+
+        response.set_etag(etag)
+        # Let browsers keep the body but revalidate it on every use
+        response.cache_control.no_cache = True
+        return response
+
+    return wrapper
@@ -0,0 +1,114 @@
+from sqlalchemy import select, delete, insert, func, case
+from sqlalchemy.dialects import postgresql, sqlite
+from types import SimpleNamespace
+from models import db, Trade, DailyStats, InstrumentStats
+
+
+STAT_COLUMNS = ['trade_count', 'win_count', 'loss_count', 'total_profit', 'gross_profit', 'gross_loss']
+
+
+def snapshot(trade):
+    """Copy the fields that feed the rollups, so an update can subtract the old values"""
+    return SimpleNamespace(
+        timestamp=trade.timestamp,
+        instrument=trade.instrument,
+        direction=trade.direction,
+        profit_loss=trade.profit_loss,
+    )
+
+
+def _deltas(profit_loss, sign):
+    pl = profit_loss or 0.0
+    return {
+        'trade_count': sign,
+        'win_count': sign if pl > 0 else 0,
+        'loss_count': sign if pl < 0 else 0,
+        'total_profit': sign * pl,
+        'gross_profit': sign * pl if pl > 0 else 0.0,
+        'gross_loss': sign * pl if pl < 0 else 0.0,
+    }
+
+
+def _upsert(model, keys, deltas):
+    dialect = db.session.get_bind().dialect.name
+    if dialect not in ('sqlite', 'postgresql'):
+        row = db.session.get(model, tuple(keys.values())) or model(**keys, **{c: 0 for c in STAT_COLUMNS})
+        for column, delta in deltas.items():
+            setattr(row, column, getattr(row, column) + delta)
+        db.session.add(row)
+        return
+
+    insert_fn = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+    stmt = insert_fn(model).values(**keys, **deltas)
+    table = model.__table__
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={column: table.c[column] + stmt.excluded[column] for column in deltas},
+    )
+    db.session.execute(stmt)
+
+
+def apply_trade(trade, sign=1):
+    """Add (sign=1) or remove (sign=-1) a trade's contribution to the rollup tables.
+
+    Runs in the caller's transaction; trade must already have its timestamp
+    (flush new trades first).
+    """
+    deltas = _deltas(trade.profit_loss, sign)
+    _upsert(DailyStats, {'date': trade.timestamp.date()}, deltas)
+    _upsert(InstrumentStats, {
+        'instrument': trade.instrument or '',
+        'direction': (trade.direction or '').lower(),
+    }, deltas)
+
+
+def apply_trades(trades, sign=1):
+    """apply_trade for many trades at once, with one upsert per affected rollup row"""
+    daily = {}
+    by_instrument = {}
+    for trade in trades:
+        deltas = _deltas(trade['profit_loss'], sign)
+        for totals, key in (
+            (daily, trade['timestamp'].date()),
+            (by_instrument, (trade['instrument'] or '', (trade['direction'] or '').lower())),
+        ):
+            current = totals.setdefault(key, dict.fromkeys(STAT_COLUMNS, 0))
+            for column, delta in deltas.items():
+                current[column] += delta
+
+    for day, deltas in daily.items():
+        _upsert(DailyStats, {'date': day}, deltas)
+    for (instrument, direction), deltas in by_instrument.items():
+        _upsert(InstrumentStats, {'instrument': instrument, 'direction': direction}, deltas)
+
+
+def _aggregates():
+    pl = func.coalesce(Trade.profit_loss, 0.0)
+    return [
+        func.count(Trade.id),
+        func.sum(case((pl > 0, 1), else_=0)),
+        func.sum(case((pl < 0, 1), else_=0)),
+        func.sum(pl),
+        func.sum(case((pl > 0, pl), else_=0.0)),
+        func.sum(case((pl < 0, pl), else_=0.0)),
+    ]
+
+
+def rebuild_rollups():
+    """Regenerate both rollup tables from the trade table in one transaction"""
+    db.session.execute(delete(DailyStats))
+    db.session.execute(delete(InstrumentStats))
+
+    day = func.date(Trade.timestamp)
+    db.session.execute(insert(DailyStats).from_select(
+        ['date'] + STAT_COLUMNS,
+        select(day, *_aggregates()).where(Trade.timestamp.isnot(None)).group_by(day),
+    ))
+
+    instrument = func.coalesce(Trade.instrument, '')
+    direction = func.lower(func.coalesce(Trade.direction, ''))
+    db.session.execute(insert(InstrumentStats).from_select(
+        ['instrument', 'direction'] + STAT_COLUMNS,
+        select(instrument, direction, *_aggregates()).group_by(instrument, direction),
+    ))
+    db.session.commit()
@@ -1,73 +1,123 @@
-from flask import request, jsonify, current_app, send_from_directory
-from werkzeug.utils import secure_filename
+from flask import request, jsonify, current_app, send_file, stream_with_context
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload, joinedload
 from models import db, Trade, Screenshot
+from queries import trade_filters, keyset_query, paginate_trades, page_size
+import rollups
+import exports
+import bulk_import
+import parsers
+import search
+import columnar
+import storage
+import thumbnails
+from versioning import bump_data_version
+from response_cache import versioned
+from changes import record_change, record_changes
+from trade_metrics import parse_trade_time, apply_derived
 import os
-import re
-import uuid
-from datetime import datetime
+import json
+import logging
+
+
+logger = logging.getLogger(__name__)
 
 
 def register_routes(app):
+    # Rows fetched per round trip when streaming the trade list
+    STREAM_BATCH_SIZE = 500
+
+    def wants_ndjson():
+        if request.args.get('format') == 'ndjson':
+            return True
+        return request.accept_mimetypes.best == 'application/x-ndjson'
+
+    def stream_trades(query):
+        # With ?limit= (or ?cursor=) the same page and X-Next-Cursor as the
+        # JSON listing, one trade per line
+        if page_size(request.args) is not None:
+            trades, next_cursor = paginate_trades(query, request.args)
+            body = ''.join(json.dumps(trade.to_dict()) + '\n' for trade in trades)
+            response = current_app.response_class(body, mimetype='application/x-ndjson')
+            if next_cursor:
+                response.headers['X-Next-Cursor'] = next_cursor
+            return response
+
+        # yield_per pulls rows from a server-side cursor in batches (screenshots
+        # are selectin-loaded per batch), so memory stays flat with history size
+        query = keyset_query(query, request.args).yield_per(STREAM_BATCH_SIZE)
+
+        def generate():
+            for trade in query:
+                yield json.dumps(trade.to_dict()) + '\n'
+
+        return current_app.response_class(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    def trade_columns_response(criteria, fmt):
+        # Plain column rows, no Trade objects or per-row dicts
+        query = Trade.query.filter(*criteria).with_entities(*columnar.TRADE_COLUMNS)
+        rows, next_cursor = paginate_trades(query, request.args)
+        if page_size(request.args) is None:
+            screenshot_filter = select(Trade.id).where(*criteria)
+        else:
+            screenshot_filter = [row.id for row in rows]
+        response = columnar.columns_response(columnar.trade_columns(rows, screenshot_filter), fmt)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
+
     # Get all trades
     @app.route('/api/trades', methods=['GET'])
+    @versioned
     def get_trades():
-        trades = Trade.query.order_by(Trade.timestamp.desc()).all()
-
-        result = []
-        for trade in trades:
-            trade_data = {
-                'id': trade.id,
-                'timestamp': trade.timestamp.isoformat(),
-                'instrument': trade.instrument,
-                'direction': trade.direction,
-                'entry': trade.entry,
-                'exit': trade.exit,
-                'stop_loss': trade.stop_loss,
-                'take_profit': trade.take_profit,
-                'size': trade.size,
-                'risk': trade.risk,
-                'reward': trade.reward,
-                'profit_loss': trade.profit_loss,
-                'duration': trade.duration,
-                'comments': trade.comments,
-                # 'strategy': trade.strategy,
-                # 'setup': trade.setup,
-                # 'mistakes': trade.mistakes,
-                # 'lessons': trade.lessons,
-                'screenshots': [{'id': s.id, 'filename': s.filename} for s in trade.screenshots]
-            }
-            result.append(trade_data)
-
-        return jsonify(result)
+        # Optional filters and keyset pagination (?limit=&cursor=); without a
+        # limit the full history is returned as before. ?format=ndjson streams it,
+        # ?format=columns|arrow (or the Accept type) sends lists per field.
+        try:
+            criteria = trade_filters(request.args)
+            fmt = columnar.wants_columns()
+            if fmt:
+                return trade_columns_response(criteria, fmt)
+            query = Trade.query.filter(*criteria).options(selectinload(Trade.screenshots))
+            if wants_ndjson():
+                return stream_trades(query)
+            trades, next_cursor = paginate_trades(query, request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        response = jsonify([trade.to_dict() for trade in trades])
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
+
+    # Search trade comments
+    @app.route('/api/trades/search', methods=['GET'])
+    @versioned
+    def search_trades():
+        # ?q= words (the last one matches as a prefix), best matches first;
+        # combines with the /api/trades filters and ?limit=
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({'error': 'No search query provided'}), 400
+        try:
+            criteria = trade_filters(request.args)
+            limit = min(page_size(request.args) or search.DEFAULT_SEARCH_LIMIT, search.MAX_SEARCH_LIMIT)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        results = search.search_trades(query, criteria, limit)
+        return jsonify([
+            {**trade.to_dict(), 'rank': rank, 'snippet': snippet}
+            for trade, rank, snippet in results
+        ])
 
     # Get a specific trade
     @app.route('/api/trades/<int:trade_id>', methods=['GET'])
+    @versioned
     def get_trade(trade_id):
-        trade = Trade.query.get_or_404(trade_id)
+        trade = Trade.query.options(joinedload(Trade.screenshots)).get_or_404(trade_id)
 
-        trade_data = {
-            'id': trade.id,
-            'timestamp': trade.timestamp.isoformat(),
-            'instrument': trade.instrument,
-            'direction': trade.direction,
-            'entry': trade.entry,
-            'exit': trade.exit,
-            'stop_loss': trade.stop_loss,
-            'take_profit': trade.take_profit,
-            'size': trade.size,
-            'risk': trade.risk,
-            'reward': trade.reward,
-            'profit_loss': trade.profit_loss,
-            'duration': trade.duration,
-            'comments': trade.comments,
-            # 'strategy': trade.strategy,
-            # 'setup': trade.setup,
-            # 'mistakes': trade.mistakes,
-            # 'lessons': trade.lessons,
-            'screenshots': [{'id': s.id, 'filename': s.filename} for s in trade.screenshots]
-        }
-
-        return jsonify(trade_data)
+        return jsonify(trade.to_dict())
 
     # Create a new trade
     @app.route('/api/trades', methods=['POST'])
@@ -85,47 +135,106 @@ def register_routes(app):
             size=float(data.get('size')),
             risk=float(data.get('risk')),
             reward=float(data.get('reward')),
+            risk_currency=data.get('risk_currency') or None,
             profit_loss=float(data.get('profit_loss')),
             duration=data.get('duration'),
             comments=data.get('comments', ''),
+            open_time=parse_trade_time(data.get('open_time')),
+            close_time=parse_trade_time(data.get('close_time')),
             # strategy=data.get('strategy'),
             # setup=data.get('setup', ''),
             # mistakes=data.get('mistakes', ''),
             # lessons=data.get('lessons', '')
         )
 
+        apply_derived(new_trade)
+
+        # Flush for the id and timestamp; the trade, its rollup deltas and its
+        # screenshots are committed together below
         db.session.add(new_trade)
-        db.session.commit()
+        db.session.flush()
+        rollups.apply_trade(new_trade)
+        bump_data_version()
+        record_change(new_trade.id, 'create')
 
         # Handle screenshot uploads
         files = request.files.getlist('screenshots')
+        filenames = []
         for file in files:
             if file and file.filename:
-                # Secure filename and make unique
-                filename = secure_filename(file.filename)
-                unique_filename = f"{uuid.uuid4().hex}_{filename}"
-
-                # Save file
-                filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], unique_filename)
-                file.save(filepath)
-
-                # Create screenshot record
-                screenshot = Screenshot(
-                    filename=unique_filename,
-                    filepath=filepath,
-                    trade_id=new_trade.id
-                )
-                db.session.add(screenshot)
+                filenames.append(storage.add_screenshot(new_trade.id, file).filename)
 
         db.session.commit()
+        thumbnails.queue_derivatives(filenames)
 
         return jsonify({'success': True, 'trade_id': new_trade.id}), 201
 
+    # Bulk import trades
+    @app.route('/api/trades/bulk', methods=['POST'])
+    def bulk_import_trades():
+        # Body is a JSON array, CSV, or concatenated broker statements
+        # (?format=json|csv|<broker>, otherwise taken from the Content-Type;
+        # plain text is read as xStation5 clipboard blocks)
+        try:
+            records = bulk_import.records_from_payload(
+                request.get_data(),
+                request.content_type or '',
+                request.args.get('format'),
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        rows = []
+        errors = []
+        for index, record in enumerate(records):
+            row, error = bulk_import.validate_record(record)
+            if error:
+                errors.append({'row': index, 'error': error})
+            else:
+                rows.append(row)
+
+        # All valid rows, their rollup deltas and the version bump in one transaction
+        if rows:
+            trade_ids = bulk_import.insert_trades(rows)
+            rollups.apply_trades(rows)
+            bump_data_version()
+            record_changes(trade_ids, 'create')
+            db.session.commit()
+
+        status = 201 if rows or not errors else 400
+        return jsonify({'success': bool(rows), 'inserted': len(rows), 'errors': errors}), status
+
+    # Bulk delete trades
+    @app.route('/api/trades/bulk-delete', methods=['POST'])
+    def bulk_delete_trades():
+        # Body is {"ids": [...]}; ids that don't exist are reported, not an error
+        data = request.get_json(silent=True) or {}
+        ids = data.get('ids')
+        if not isinstance(ids, list) or not ids:
+            return jsonify({'error': 'ids must be a non-empty list'}), 400
+        if not all(isinstance(trade_id, int) and not isinstance(trade_id, bool) for trade_id in ids):
+            return jsonify({'error': 'ids must be integers'}), 400
+
+        # Rows, rollup deltas, change log and version bump in one transaction;
+        # the files are removed in the background after commit
+        rows, filenames = bulk_import.delete_trades(ids)
+        deleted_ids = [row['id'] for row in rows]
+        if rows:
+            rollups.apply_trades(rows, -1)
+            bump_data_version()
+            record_changes(deleted_ids, 'delete')
+        db.session.commit()
+        storage.reap_files(filenames)
+
+        missing = sorted(set(ids) - set(deleted_ids))
+        return jsonify({'success': True, 'deleted': len(deleted_ids), 'missing': missing})
+
     # Update a trade
     @app.route('/api/trades/<int:trade_id>', methods=['PUT'])
     def update_trade(trade_id):
         trade = Trade.query.get_or_404(trade_id)
         data = request.form
+        before = rollups.snapshot(trade)
 
         # Update trade fields
         trade.instrument = data.get('instrument', trade.instrument)
@@ -137,35 +246,33 @@ def register_routes(app):
         trade.size = float(data.get('size', trade.size))
         trade.risk = float(data.get('risk', trade.risk))
         trade.reward = float(data.get('reward', trade.reward))
+        trade.risk_currency = data.get('risk_currency', trade.risk_currency) or None
         trade.profit_loss = float(data.get('profit_loss', trade.profit_loss))
         trade.duration = data.get('duration', trade.duration)
         trade.comments = data.get('comments', trade.comments)
+        trade.open_time = parse_trade_time(data.get('open_time', trade.open_time))
+        trade.close_time = parse_trade_time(data.get('close_time', trade.close_time))
+        apply_derived(trade)
         # trade.strategy = data.get('strategy', trade.strategy)
         # trade.setup = data.get('setup', trade.setup)
         # trade.mistakes = data.get('mistakes', trade.mistakes)
         # trade.lessons = data.get('lessons', trade.lessons)
 
+        # Move the trade's contribution in the rollup tables
+        rollups.apply_trade(before, -1)
+        rollups.apply_trade(trade)
+        bump_data_version()
+        record_change(trade.id, 'update')
+
         # Handle new screenshots
         files = request.files.getlist('screenshots')
+        filenames = []
         for file in files:
             if file and file.filename:
-                # Secure filename and make unique
-                filename = secure_filename(file.filename)
-                unique_filename = f"{uuid.uuid4().hex}_{filename}"
-
-                # Save file
-                filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], unique_filename)
-                file.save(filepath)
-
-                # Create screenshot record
-                screenshot = Screenshot(
-                    filename=unique_filename,
-                    filepath=filepath,
-                    trade_id=trade.id
-                )
-                db.session.add(screenshot)
+                filenames.append(storage.add_screenshot(trade.id, file).filename)
 
         db.session.commit()
+        thumbnails.queue_derivatives(filenames)
 
         return jsonify({'success': True})
 
@@ -174,161 +281,80 @@ def register_routes(app):
     def delete_trade(trade_id):
         trade = Trade.query.get_or_404(trade_id)
 
-        # Delete associated screenshots
+        # Delete associated screenshot records; files go once unreferenced
+        filenames = [screenshot.filename for screenshot in trade.screenshots]
         for screenshot in trade.screenshots:
-            # Delete file from disk
-            try:
-                os.remove(screenshot.filepath)
-            except:
-                pass
-
-            # Delete record
             db.session.delete(screenshot)
 
         # Delete trade
+        rollups.apply_trade(trade, -1)
+        bump_data_version()
+        record_change(trade.id, 'delete')
         db.session.delete(trade)
         db.session.commit()
+        storage.reap_files(filenames)
 
         return jsonify({'success': True})
 
     # Get screenshot
     @app.route('/api/screenshots/<filename>')
     def get_screenshot(filename):
-        return send_from_directory(current_app.config['UPLOAD_FOLDER'], filename)
+        # ?size=thumb|medium serves a resized WebP (JPEG if the client doesn't
+        # accept WebP), rendered on first request when the upload queue hasn't
+        # produced it yet; the original is sent when it can't be rendered
+        size = request.args.get('size')
+        if not size:
+            return storage.send_screenshot(filename)
+        if size not in thumbnails.SIZES:
+            return jsonify({'error': f'Unknown size: {size}'}), 400
+
+        fmt = 'webp' if request.accept_mimetypes['image/webp'] else 'jpeg'
+        derivative = thumbnails.get_derivative(filename, size, fmt)
+        response = storage.send_screenshot(derivative or filename, fallback=derivative is None)
+        response.vary.add('Accept')
+        return response
 
     # Delete screenshot
     @app.route('/api/screenshots/<int:screenshot_id>', methods=['DELETE'])
     def delete_screenshot(screenshot_id):
         screenshot = Screenshot.query.get_or_404(screenshot_id)
+        filename = screenshot.filename
 
-        # Delete file from disk
-        try:
-            os.remove(screenshot.filepath)
-        except:
-            pass
-
-        # Delete record
+        # Delete record; the file goes once no other screenshot uses it
         db.session.delete(screenshot)
+        bump_data_version()
+        record_change(screenshot.trade_id, 'update')
         db.session.commit()
+        storage.reap_files([filename])
 
         return jsonify({'success': True})
 
     # Export to Excel endpoint
     @app.route('/api/export/excel')
     def export_excel():
-        import io
-        import os
-        from openpyxl import Workbook, load_workbook
-        from openpyxl.styles import Font, Alignment, PatternFill
-        from flask import send_file
-
-        file_path = os.path.join(app.root_path, 'static', 'exports', 'trades_export.xlsx')
+        # Full export by default; ?mode=incremental only writes trades added
+        # since the previous export, using the watermark stored in the database.
+        # Only incremental exports move the watermark.
+        incremental = request.args.get('mode') == 'incremental'
+        watermark = exports.get_watermark('excel') if incremental else None
+        since_id = watermark.last_trade_id if incremental else 0
+
+        filename = 'trades_export_incremental.xlsx' if incremental else 'trades_export.xlsx'
+        file_path = os.path.join(app.root_path, 'static', 'exports', filename)
         os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        
-        # Check if file exists
-        if os.path.exists(file_path):
-            # Load existing workbook
-            wb = load_workbook(file_path)
-            ws = wb.active if "Trade Journal" in wb.sheetnames else wb.create_sheet("Trade Journal")
-            
-            # Get existing trade IDs from the Excel file
-            existing_ids = set()
-            id_col = None
-            
-            # Find the ID column if it exists
-            for idx, cell in enumerate(ws[1]):
-                if cell.value == 'ID':
-                    id_col = idx
-                    break
-            
-            # If ID column exists, collect existing IDs
-            if id_col is not None:
-                for row in ws.iter_rows(min_row=2):
-                    if row[id_col].value:
-                        existing_ids.add(row[id_col].value)
-        else:
-            # Create new workbook
-            wb = Workbook()
-            ws = wb.active
-            ws.title = "Trade Journal"
-            
-            # Add headers
-            headers = [
-                'ID', 'Timestamp', 'Instrument', 'Direction', 'Entry', 'Exit',
-                'Stop Loss', 'Take Profit', 'Size', 'Risk', 'Reward',
-                'P/L', 'Duration', 'comments',
-                # 'Strategy', 'Setup', 'Mistakes', 'Lessons'
-            ]
-            ws.append(headers)
-
-            # Format headers
-            header_style = {
-                'fill': PatternFill(start_color='4F81BD', fill_type='solid'),
-                'font': Font(color='FFFFFF', bold=True),
-                'alignment': Alignment(horizontal='center')
-            }
-
-            for col in range(1, len(headers) + 1):
-                cell = ws.cell(row=1, column=col)
-                for attr, value in header_style.items():
-                    setattr(cell, attr, value)
-                    
-            existing_ids = set()
-
-        # Add data
-        trades = Trade.query.all()
-        next_row = ws.max_row + 1
-        
-        for trade in trades:
-            # Skip if trade already exists in the file
-            if hasattr(trade, 'id') and trade.id in existing_ids:
-                continue
-                
-            row = [
-                trade.id if hasattr(trade, 'id') else None,
-                trade.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-                trade.instrument,
-                trade.direction,
-                trade.entry,
-                trade.exit,
-                trade.stop_loss,
-                trade.take_profit,
-                trade.size,
-                trade.risk,
-                trade.reward,
-                trade.profit_loss,
-                trade.duration,
-                trade.comments
-                # trade.strategy,
-                # trade.setup,
-                # trade.mistakes,
-                # trade.lessons
-            ]
-            ws.append(row)
-
-        # Adjust column widths
-        for col in ws.columns:
-            max_len = max((len(str(cell.value)) for cell in col), default=10)
-            ws.column_dimensions[col[0].column_letter].width = min(max_len + 2, 50)
-
-        # Save to disk
-        wb.save(file_path)
-        
-        # Also save to memory for download
-        output = io.BytesIO()
-        wb.save(output)
-        output.seek(0)
+
+        _, last_row = exports.write_xlsx(file_path, exports.export_rows(since_id=since_id))
+        if incremental:
+            exports.advance_watermark(watermark, last_row)
 
         # Return file for download
         return send_file(
-            output,
+            file_path,
             mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            download_name='trades_export.xlsx',
+            download_name=filename,
             as_attachment=True
         )
 
-    
-
     @app.route('/api/parse-trade', methods=['POST'])
     def parse_trade():
         try:
@@ -338,124 +364,15 @@ def register_routes(app):
                 return jsonify({'error': 'No clipboard_text provided'}), 400
             
             try:
-                trade_data = parse_xstation5_format(clipboard_text)
-                print(f"Parsed trade data: {trade_data}")  # Add debug log
+                trade_data = parsers.parse_statement(clipboard_text, data.get('broker', 'xstation5'))
                 return jsonify({'trade': trade_data})
             except Exception as e:
-                print(f"Error parsing trade: {str(e)}")  # Add debug log
+                logger.info("Error parsing trade: %s", e)
                 return jsonify({'error': str(e)}), 400
         except Exception as e:
-            print("Error parsing trade:", e)
+            logger.exception("Error parsing trade")
             return jsonify({"error": str(e)}), 500
-    
-    def parse_xstation5_format(text):
-        lines = [line.strip() for line in text.strip().splitlines() if line.strip()]
-        
-        trade = {}
-        label_map = {
-            "Typ": "direction",
-            "Wolumen": "size",
-            "Zysk netto": "profit_loss",
-            "Cena otwarcia": "entry",
-            "Cena zamknięcia": "exit",
-            "Stop Loss": "stop_loss",
-            "Take Profit": "take_profit",
-        }
-
-        # Detect instrument (first non-empty line after "Szczegóły pozycji")
-        try:
-            idx = lines.index("Szczegóły pozycji")
-            instrument = lines[idx + 1]
-            trade["instrument"] = instrument
-        except Exception:
-            trade["instrument"] = ""
-        def parse_float(value):
-            """Convert localized float like '18 939.71' to float 18939.71"""
-            try:
-                return float(value.replace(" ", "").replace(",", "."))
-            except:
-                return 0.0
-        # Walk through all lines to get data
-        i = 0
-        while i < len(lines):
-            line = lines[i]
-            if line in label_map:
-                key = label_map[line]
-                value = lines[i + 1] if i + 1 < len(lines) else ""
-                if key == "direction":
-                    trade["direction"] = "long" if value.lower() == "buy" else "short"
-                elif key in ["entry", "exit", "stop_loss", "take_profit", "profit_loss", "size"]:
-                    trade[key] = parse_float(value)
-                i += 2
-            elif line == "Czas otwarcia":
-                if i + 2 < len(lines):
-                    open_time = f"{lines[i + 1]} {lines[i + 2]}"
-                    trade["open_time"] = open_time
-                    i += 3
-                else:
-                    i += 1
-            elif line == "Czas zamknięcia":
-                if i + 2 < len(lines):
-                    close_time = f"{lines[i + 1]} {lines[i + 2]}"
-                    trade["close_time"] = close_time
-                    i += 3
-                else:
-                    i += 1
-            else:
-                i += 1
-
-        # Calculate duration
-        try:
-            if "open_time" in trade and "close_time" in trade:
-                fmt = "%d.%m.%Y %H:%M"
-                t1 = datetime.strptime(trade["open_time"], fmt)
-                t2 = datetime.strptime(trade["close_time"], fmt)
-                delta = t2 - t1
-                mins = int(delta.total_seconds() // 60)
-                trade["duration"] = f"{mins} min"
-        except Exception:
-            trade["duration"] = ""
 
-        try:
-            entry = trade.get("entry", 0)
-            sl = trade.get("stop_loss", 0)
-            tp = trade.get("take_profit", 0)
-            size = trade.get("size", 0)
-            direction = trade.get("direction", "")
-            instrument = trade.get("instrument", "")
-            
-            # Check if instrument is forex (common forex pairs contain currency codes)
-            is_forex = any(pair in instrument.upper() for pair in ["USD", "EUR", "GBP", "JPY", "AUD", "NZD", "CAD", "CHF"])
-    
-            if all([entry, sl, tp, size]):
-                if direction == "long":
-                    if is_forex:
-                        # Forex calculation using pips
-                        risk_pips = abs(entry - sl) * 10000  # Convert to pips
-                        reward_pips = abs(tp - entry) * 10000
-                        trade["risk"] = round(risk_pips * size, 2)
-                        trade["reward"] = round(reward_pips * size, 2)
-                    else:
-                        # Original calculation for other instruments
-                        trade["risk"] = round((entry - sl) * size, 2)
-                        trade["reward"] = round((tp - entry) * size, 2)
-                elif direction == "short":
-                    if is_forex:
-                        # Forex calculation using pips
-                        risk_pips = abs(sl - entry) * 10000
-                        reward_pips = abs(entry - tp) * 10000
-                        trade["risk"] = round(risk_pips * size, 2)
-                        trade["reward"] = round(reward_pips * size, 2)
-                    else:
-                        # Original calculation for other instruments
-                        trade["risk"] = round((sl - entry) * size, 2)
-                        trade["reward"] = round((entry - tp) * size, 2)
-        except Exception as e:
-            print(f"Error calculating risk/reward: {e}")
-            trade["risk"] = 0
-            trade["reward"] = 0
-
-        return trade
    # Add this endpoint to your existing routes.py file
 
     # Upload screenshot for existing trade
@@ -472,22 +389,11 @@ def register_routes(app):
             return jsonify({'error': 'No file selected'}), 400
         
         if file and file.filename:
-            # Secure filename and make unique
-            filename = secure_filename(file.filename)
-            unique_filename = f"{uuid.uuid4().hex}_{filename}"
-
-            # Save file
-            filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], unique_filename)
-            file.save(filepath)
-
-            # Create screenshot record
-            screenshot = Screenshot(
-                filename=unique_filename,
-                filepath=filepath,
-                trade_id=trade.id
-            )
-            db.session.add(screenshot)
+            screenshot = storage.add_screenshot(trade.id, file)
+            bump_data_version()
+            record_change(trade.id, 'update')
             db.session.commit()
+            thumbnails.queue_derivatives([screenshot.filename])
             
             # Return screenshot data for frontend
             return jsonify({
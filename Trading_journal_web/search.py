@@ -0,0 +1,145 @@
+from sqlalchemy import select, inspect, text, func, table, column, literal_column
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import selectinload
+from models import db, Trade
+import html
+import logging
+import re
+
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TABLE = 'trade_fts'
+DEFAULT_SEARCH_LIMIT = 50
+MAX_SEARCH_LIMIT = 500
+
+# bm25 is computed for every candidate, so a word found in a large share of
+# the journal is ranked among its most recent RANK_WINDOW matches only
+RANK_WINDOW = 2000
+
+# Tokens of the search box; FTS5 operators and quotes are not passed through
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Highlight markers that can't occur in comments; replaced after escaping
+_MARK_START = '\x02'
+_MARK_END = '\x03'
+
+# External-content FTS5 index over Trade.comments, kept in sync by triggers so
+# the routes and bulk imports need no extra work
+_SEARCH_DDL = [
+    f"""CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5(
+        comments, content='trade', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER {SEARCH_TABLE}_ai AFTER INSERT ON trade BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, comments) VALUES (new.id, new.comments);
+    END""",
+    f"""CREATE TRIGGER {SEARCH_TABLE}_ad AFTER DELETE ON trade BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, comments) VALUES ('delete', old.id, old.comments);
+    END""",
+    f"""CREATE TRIGGER {SEARCH_TABLE}_au AFTER UPDATE OF comments ON trade BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, comments) VALUES ('delete', old.id, old.comments);
+        INSERT INTO {SEARCH_TABLE}(rowid, comments) VALUES (new.id, new.comments);
+    END""",
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')",
+]
+
+_fts = table(SEARCH_TABLE, column('rowid'))
+_fts_ref = literal_column(SEARCH_TABLE)
+
+
+def create_search_index():
+    """Create and fill the FTS5 index if missing. Returns False where FTS5 isn't
+    available (other databases, or SQLite built without it)."""
+    if db.engine.dialect.name != 'sqlite':
+        return False
+    if inspect(db.engine).has_table(SEARCH_TABLE):
+        return True
+    try:
+        with db.engine.begin() as connection:
+            for statement in _SEARCH_DDL:
+                connection.execute(text(statement))
+    except OperationalError as e:
+        logger.warning("Full-text search unavailable: %s", e)
+        return False
+    return True
+
+
+def search_index_available():
+    return db.engine.dialect.name == 'sqlite' and inspect(db.engine).has_table(SEARCH_TABLE)
+
+
+def match_expression(query):
+    """Turn free text into an FTS5 query: every word must match, the last one as a prefix"""
+    tokens = _TOKEN_RE.findall(query)
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def _snippet(raw):
+    escaped = html.escape(raw or '')
+    return escaped.replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>')
+
+
+def _like_escape(word):
+    """word with the LIKE wildcards (and the escape character) taken literally"""
+    return word.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search_trades(query, criteria, limit=DEFAULT_SEARCH_LIMIT):
+    """Best-ranked trades whose comments match query, as (trade, rank, snippet).
+
+    Rank is FTS5 bm25 (lower is better) over the newest RANK_WINDOW matches;
+    snippets are HTML-escaped with the matches wrapped in <mark>. Without the
+    FTS5 index this falls back to a LIKE scan in timestamp order.
+    """
+    expression = match_expression(query)
+    if expression is None:
+        return []
+
+    if not search_index_available():
+        words = _TOKEN_RE.findall(query)
+        trades = (
+            Trade.query.options(selectinload(Trade.screenshots))
+            .filter(*criteria, *[Trade.comments.ilike(f'%{_like_escape(word)}%', escape='\\') for word in words])
+            .order_by(Trade.timestamp.desc(), Trade.id.desc())
+            .limit(limit)
+            .all()
+        )
+        return [(trade, None, html.escape(trade.comments or '')) for trade in trades]
+
+    match = _fts_ref.op('MATCH')(expression)
+    candidates = (
+        select(Trade.id)
+        .join_from(Trade, _fts, _fts.c.rowid == Trade.id)
+        .where(match, *criteria)
+        .order_by(_fts.c.rowid.desc())
+        .limit(RANK_WINDOW)
+        .subquery()
+    )
+    floor = db.session.execute(select(func.min(candidates.c.id))).scalar()
+    if floor is None:
+        return []
+
+    # Rank ids first; rows and snippets are then built for the top hits only
+    rank = func.bm25(_fts_ref)
+    ranked = select(_fts.c.rowid, rank).where(match, _fts.c.rowid >= floor)
+    if criteria:
+        ranked = ranked.join_from(_fts, Trade, _fts.c.rowid == Trade.id).where(*criteria)
+    ranks = dict(db.session.execute(ranked.order_by(rank).limit(limit)).all())
+    if not ranks:
+        return []
+
+    snippet = func.snippet(_fts_ref, 0, _MARK_START, _MARK_END, '…', 16)
+    rows = db.session.execute(
+        select(Trade, snippet)
+        .join_from(Trade, _fts, _fts.c.rowid == Trade.id)
+        # The rowid range is answered by FTS5 itself, IN is not
+        .where(match, _fts.c.rowid.between(min(ranks), max(ranks)), Trade.id.in_(ranks))
+        .options(selectinload(Trade.screenshots))
+    ).all()
+    rows.sort(key=lambda row: ranks[row[0].id])
+    return [(trade, ranks[trade.id], _snippet(raw)) for trade, raw in rows]
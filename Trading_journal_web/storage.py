@@ -0,0 +1,375 @@
+from flask import current_app, request, send_from_directory, abort
+from werkzeug.utils import secure_filename, safe_join
+from sqlalchemy import select
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from models import db, Screenshot
+from versioning import bump_data_version
+from changes import record_changes
+import thumbnails
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+import time
+import uuid
+import logging
+
+try:
+    import fcntl
+except ImportError:  # Windows: the in-process lock only
+    fcntl = None
+
+
+logger = logging.getLogger(__name__)
+
+# Bytes read per step while hashing an upload
+CHUNK_SIZE = 64 * 1024
+
+# <sha256><ext> blobs (and their <sha256>_<size><ext> derivatives), and the
+# older <uuid4 hex>_<name> uploads; these names are never reused for different
+# content, so they can be cached forever
+_CONTENT_NAME_RE = re.compile(r'([0-9a-f]{64})(_[a-z]+)?(\.[A-Za-z0-9]+)?')
+_LEGACY_NAME_RE = re.compile(r'[0-9a-f]{32}_.+')
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Filenames per reference lookup (keeps IN lists under the bound parameter limit)
+REFERENCE_BATCH_SIZE = 500
+
+# The sweeper leaves younger files alone: an upload's blob is written before
+# its Screenshot row commits
+SWEEP_GRACE_SECONDS = 3600
+
+# release_files leaves blobs touched this recently to the sweeper: an upload
+# reusing the blob may not have committed its Screenshot row yet
+REAP_GRACE_SECONDS = 300
+
+_blob_lock = threading.Lock()
+
+
+def _upload_folder():
+    return current_app.config['UPLOAD_FOLDER']
+
+
+@contextmanager
+def blob_lock():
+    """Serializes blob reuse in store_blob against removal in release_files,
+    across threads and (where fcntl exists) worker processes"""
+    with _blob_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(_upload_folder(), '.blobs.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def store_blob(file):
+    """Stream an uploaded file to disk under its SHA-256 and return the stored filename.
+
+    The upload is hashed while it is copied to a temporary file, so it is read
+    once and never held in memory. If a blob with the same content already
+    exists the copy is discarded.
+    """
+    folder = _upload_folder()
+    _, ext = os.path.splitext(secure_filename(file.filename))
+    tmp_path = os.path.join(folder, f".upload-{uuid.uuid4().hex}.tmp")
+
+    digest = hashlib.sha256()
+    with open(tmp_path, 'wb') as out:
+        while True:
+            chunk = file.stream.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            out.write(chunk)
+
+    filename = f"{digest.hexdigest()}{ext.lower()}"
+    path = os.path.join(folder, filename)
+    with blob_lock():
+        if os.path.exists(path):
+            os.remove(tmp_path)
+            # Reused blob: refresh its age so neither release_files nor the
+            # orphan sweeper takes it before the new row commits
+            os.utime(path)
+        else:
+            os.replace(tmp_path, path)
+    return filename
+
+
+def add_screenshot(trade_id, file):
+    """Store an upload and add its Screenshot row to the session (caller commits)"""
+    filename = store_blob(file)
+    screenshot = Screenshot(
+        filename=filename,
+        filepath=os.path.join(_upload_folder(), filename),
+        trade_id=trade_id
+    )
+    db.session.add(screenshot)
+    return screenshot
+
+
+def send_screenshot(filename, fallback=False):
+    """Serve a stored screenshot (or a derivative path under UPLOAD_FOLDER) with
+    validators and cache headers.
+
+    Content-addressed files use their hash as a strong ETag. Conditional and
+    Range requests are answered by Werkzeug, or by the front proxy when
+    USE_X_SENDFILE or SCREENSHOT_ACCEL_REDIRECT (nginx) is configured.
+
+    fallback marks an original sent in place of a derivative that couldn't be
+    rendered: it gets its own ETag and must be revalidated, so clients pick up
+    the real derivative once it exists.
+    """
+    folder = _upload_folder()
+    name = os.path.basename(filename)
+    match = _CONTENT_NAME_RE.fullmatch(name)
+    if match is None:
+        etag = True
+    elif match.group(2):
+        # Derivatives of one blob differ by size and format
+        etag = name
+    else:
+        etag = match.group(1)
+    immutable = bool(match or _LEGACY_NAME_RE.fullmatch(name))
+    if fallback:
+        etag = f"{etag if isinstance(etag, str) else name}-original"
+        immutable = False
+
+    accel_prefix = current_app.config.get('SCREENSHOT_ACCEL_REDIRECT')
+    if accel_prefix:
+        # Relative folders resolve against the app root, as in send_from_directory
+        path = safe_join(os.path.join(current_app.root_path, folder), filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+        response = current_app.response_class(
+            mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        )
+        response.headers['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{filename}"
+        if isinstance(etag, str):
+            response.set_etag(etag)
+        response = response.make_conditional(request)
+    else:
+        response = send_from_directory(folder, filename, etag=etag)
+
+    if immutable:
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+
+def referenced_filenames(filenames):
+    """The subset of filenames still used by some Screenshot row"""
+    names = sorted(set(filenames))
+    referenced = set()
+    for start in range(0, len(names), REFERENCE_BATCH_SIZE):
+        batch = names[start:start + REFERENCE_BATCH_SIZE]
+        referenced.update(db.session.scalars(
+            select(Screenshot.filename).where(Screenshot.filename.in_(batch)).distinct()
+        ))
+    return referenced
+
+
+def _remove_blob(filename):
+    try:
+        os.remove(os.path.join(_upload_folder(), filename))
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        # Left for sweep_orphans
+        logger.warning("Could not remove %s: %s", filename, e)
+    thumbnails.remove_derivatives(filename)
+
+
+def _recently_touched(filename, grace_seconds):
+    try:
+        return os.stat(os.path.join(_upload_folder(), filename)).st_mtime > time.time() - grace_seconds
+    except FileNotFoundError:
+        return False
+
+
+def release_files(filenames, grace_seconds=REAP_GRACE_SECONDS):
+    """Remove blobs that no Screenshot references any more.
+
+    Call after the deleting transaction has committed. References are read
+    under blob_lock, and blobs an upload touched within grace_seconds are
+    kept, so a blob being reused by an upload whose row hasn't committed yet
+    is never removed. Returns the unreferenced filenames kept that way.
+    """
+    kept = []
+    with blob_lock():
+        # A fresh read, not a snapshot from before the lock was taken
+        db.session.rollback()
+        referenced = referenced_filenames(filenames)
+        for filename in set(filenames) - referenced:
+            if _recently_touched(filename, grace_seconds):
+                kept.append(filename)
+            else:
+                _remove_blob(filename)
+    return kept
+
+
+class FileReaper:
+    """One background thread running release_files, so deletes don't wait on the filesystem"""
+
+    def __init__(self, app):
+        self.app = app
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def submit(self, filenames):
+        filenames = list(filenames)
+        if not filenames:
+            return None
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='reaper')
+            return self._executor.submit(self._release, filenames)
+
+    def _release(self, filenames):
+        with self.app.app_context():
+            try:
+                kept = release_files(filenames)
+            except Exception:
+                logger.exception("Could not release %d files", len(filenames))
+                return
+        if kept:
+            # Look again once the grace period is over (sweep_orphans catches
+            # them if the process exits first)
+            timer = threading.Timer(REAP_GRACE_SECONDS, self.submit, [kept])
+            timer.daemon = True
+            timer.start()
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+def init_storage(app):
+    app.extensions['file_reaper'] = FileReaper(app)
+
+
+def reap_files(filenames):
+    """Queue blobs for release_files once the caller's transaction has committed"""
+    return current_app.extensions['file_reaper'].submit(filenames)
+
+
+def sweep_orphans(grace_seconds=SWEEP_GRACE_SECONDS, dry_run=False):
+    """Remove files in the upload folder that no Screenshot references.
+
+    Covers blobs whose removal failed or was lost with the process, their
+    derivatives, and abandoned upload temp files. Returns (files, bytes).
+    """
+    folder = _upload_folder()
+    cutoff = time.time() - grace_seconds
+    referenced = set(db.session.scalars(select(Screenshot.filename).distinct()))
+    referenced_stems = {os.path.splitext(filename)[0] for filename in referenced}
+
+    candidates = []
+    for entry in os.scandir(folder):
+        if not entry.is_file():
+            continue
+        if entry.name.startswith('.'):
+            if entry.name.startswith('.upload-') and entry.name.endswith('.tmp'):
+                candidates.append(entry)
+        elif entry.name not in referenced:
+            candidates.append(entry)
+
+    derived = os.path.join(folder, thumbnails.DERIVED_DIR)
+    if os.path.isdir(derived):
+        for entry in os.scandir(derived):
+            # <stem>_<size><ext>, or a render's temp file; other names are left alone
+            stem = thumbnails.derivative_stem(entry.name)
+            if entry.is_file() and stem is not None and stem not in referenced_stems:
+                candidates.append(entry)
+
+    removed = 0
+    reclaimed = 0
+    for entry in candidates:
+        try:
+            stat = entry.stat()
+            if stat.st_mtime > cutoff:
+                continue
+            if not dry_run:
+                os.remove(entry.path)
+        except FileNotFoundError:
+            continue
+        except OSError as e:
+            logger.warning("Could not remove %s: %s", entry.path, e)
+            continue
+        removed += 1
+        reclaimed += stat.st_size
+    return removed, reclaimed
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def migrate_legacy_screenshots():
+    """Rename uuid-named uploads to content-addressed blobs, merging duplicates.
+
+    The renamed screenshots' trades are logged as updated and the data
+    version is bumped in the same transaction, so cached listings and ETags
+    stop pointing at the old names. Returns (screenshots updated, duplicate
+    files removed).
+    """
+    folder = _upload_folder()
+    updated = 0
+    duplicates = []
+    moves = []
+    # Legacy name -> blob name, for rows sharing one legacy file
+    renamed = {}
+    trade_ids = set()
+    try:
+        for screenshot in Screenshot.query.all():
+            filename = renamed.get(screenshot.filename)
+            if filename is None:
+                path = os.path.join(folder, screenshot.filename)
+                if not os.path.exists(path):
+                    continue
+                _, ext = os.path.splitext(screenshot.filename)
+                filename = f"{hash_file(path)}{ext.lower()}"
+                if filename == screenshot.filename:
+                    continue
+
+                target = os.path.join(folder, filename)
+                if os.path.exists(target):
+                    duplicates.append(path)
+                else:
+                    os.replace(path, target)
+                    moves.append((path, target))
+                renamed[screenshot.filename] = filename
+            screenshot.filename = filename
+            screenshot.filepath = os.path.join(folder, filename)
+            trade_ids.add(screenshot.trade_id)
+            updated += 1
+        if updated:
+            bump_data_version()
+            record_changes(sorted(trade_ids), 'update')
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        for path, target in reversed(moves):
+            os.replace(target, path)
+        raise
+
+    # Only delete the duplicate copies once the rows point at the shared blob
+    for path in duplicates:
+        os.remove(path)
+    return updated, len(duplicates)
@@ -0,0 +1,205 @@
+from flask import current_app
+from werkzeug.utils import safe_join
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+import logging
+import os
+import threading
+import uuid
+
+
+logger = logging.getLogger(__name__)
+
+# Size name -> longest edge in pixels
+SIZES = {
+    'thumb': 320,
+    'medium': 1280,
+}
+
+# Format -> (extension, Pillow format, save options)
+FORMATS = {
+    'webp': ('.webp', 'WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('.jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+# Format queued on upload; JPEG copies are only rendered on request
+DEFAULT_FORMAT = 'webp'
+
+# Derivatives live in a subfolder of UPLOAD_FOLDER
+DERIVED_DIR = 'derived'
+
+
+@lru_cache(maxsize=None)
+def pillow_available():
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def render_derivative(source, target, max_edge, fmt):
+    """Write a copy of source no larger than max_edge to target; runs in a pool worker"""
+    from PIL import Image, ImageOps
+
+    _, pil_format, options = FORMATS[fmt]
+    with Image.open(source) as original:
+        image = ImageOps.exif_transpose(original)
+        image.thumbnail((max_edge, max_edge))
+        if pil_format == 'JPEG':
+            # No alpha in JPEG; flatten onto white
+            rgba = image.convert('RGBA')
+            image = Image.new('RGB', rgba.size, (255, 255, 255))
+            image.paste(rgba, mask=rgba.getchannel('A'))
+        elif image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp_path = f"{target}.{uuid.uuid4().hex}.tmp"
+        try:
+            image.save(tmp_path, pil_format, **options)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    os.replace(tmp_path, target)
+    return target
+
+
+class DerivativePool:
+    """Bounded process pool for rendering; a derivative already in flight is not queued twice"""
+
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self._executor = None
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def submit(self, source, target, max_edge, fmt):
+        with self._lock:
+            future = self._pending.get(target)
+            if future is not None:
+                return future
+            try:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                future = self._executor.submit(render_derivative, source, target, max_edge, fmt)
+            except BrokenProcessPool:
+                # A worker died and took the pool with it; start a fresh one
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                future = self._executor.submit(render_derivative, source, target, max_edge, fmt)
+            self._pending[target] = future
+        future.add_done_callback(lambda done: self._finished(target, done))
+        return future
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def _finished(self, target, future):
+        with self._lock:
+            self._pending.pop(target, None)
+        if future.exception() is not None:
+            logger.warning("Could not render %s: %s", target, future.exception())
+
+
+def init_thumbnails(app):
+    app.extensions['thumbnails'] = DerivativePool(app.config.get('THUMBNAIL_WORKERS', 2))
+
+
+def _pool():
+    return current_app.extensions['thumbnails']
+
+
+def _upload_folder():
+    return current_app.config['UPLOAD_FOLDER']
+
+
+def derivative_name(filename, size, fmt):
+    stem, _ = os.path.splitext(filename)
+    return f"{stem}_{size}{FORMATS[fmt][0]}"
+
+
+def derivative_stem(name):
+    """Stem of the upload a derivative (or a render's temp file) belongs to; None for other names"""
+    if name.endswith('.tmp'):
+        # <derivative>.<uuid hex>.tmp
+        name, _ = os.path.splitext(name[:-len('.tmp')])
+    base, ext = os.path.splitext(name)
+    if ext not in {extension for extension, _, _ in FORMATS.values()}:
+        return None
+    for size in SIZES:
+        if base.endswith(f"_{size}"):
+            return base[:-len(size) - 1]
+    return None
+
+
+def _paths(filename, size, fmt):
+    source = safe_join(_upload_folder(), filename)
+    target = os.path.join(_upload_folder(), DERIVED_DIR, derivative_name(filename, size, fmt))
+    return source, target
+
+
+def queue_derivatives(filenames):
+    """Render every size of freshly stored uploads in the background; a no-op without Pillow"""
+    if not pillow_available():
+        return
+    for filename in set(filenames):
+        for size, max_edge in SIZES.items():
+            source, target = _paths(filename, size, DEFAULT_FORMAT)
+            if not os.path.exists(target):
+                _pool().submit(os.path.abspath(source), os.path.abspath(target), max_edge, DEFAULT_FORMAT)
+
+
+def get_derivative(filename, size, fmt, timeout=30):
+    """Path of a derivative relative to UPLOAD_FOLDER, rendering it on a miss.
+
+    None when it can't be produced (no Pillow, missing or unreadable original);
+    callers then serve the original.
+    """
+    source, target = _paths(filename, size, fmt)
+    name = f"{DERIVED_DIR}/{os.path.basename(target)}"
+    if os.path.exists(target):
+        return name
+    if not pillow_available() or source is None or not os.path.isfile(source):
+        return None
+    try:
+        _pool().submit(os.path.abspath(source), os.path.abspath(target), SIZES[size], fmt).result(timeout)
+    except Exception:
+        # Render errors are logged by the pool
+        return None
+    return name
+
+
+def remove_derivatives(filename):
+    for size in SIZES:
+        for fmt in FORMATS:
+            try:
+                os.remove(_paths(filename, size, fmt)[1])
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning("Could not remove derivative of %s: %s", filename, e)
+
+
+def backfill_derivatives():
+    """Render missing default derivatives for every file in the upload folder.
+
+    Returns (rendered, failed).
+    """
+    folder = _upload_folder()
+    futures = []
+    for filename in sorted(os.listdir(folder)):
+        if filename.startswith('.') or not os.path.isfile(os.path.join(folder, filename)):
+            continue
+        for size, max_edge in SIZES.items():
+            source, target = _paths(filename, size, DEFAULT_FORMAT)
+            if not os.path.exists(target):
+                futures.append(_pool().submit(os.path.abspath(source), os.path.abspath(target), max_edge, DEFAULT_FORMAT))
+
+    done, _ = wait(futures)
+    failed = sum(1 for future in done if future.exception() is not None)
+    return len(done) - failed, failed
@@ -0,0 +1,276 @@
+from flask import request, jsonify
+from sqlalchemy import select
+from collections import OrderedDict
+from models import db, Trade, TradeChange
+from analytics import period_starts
+from changes import latest_cursor, cursor_expired
+from queries import trade_filters, FILTER_ARGS
+from response_cache import versioned
+from versioning import current_data_version
+import columnar
+import threading
+
+
+# ?bucket= value -> analytics timeframe
+BUCKETS = {'day': 'daily', 'week': 'weekly', 'month': 'monthly'}
+
+# For the annualised Sharpe-style ratio of bucket P/L
+PERIODS_PER_YEAR = {'day': 252, 'week': 52, 'month': 12}
+
+DEFAULT_WINDOW = 20
+MAX_WINDOW = 1000
+
+# Filter/bucket/window combinations kept for incremental updates
+MAX_STATES = 32
+
+BUCKET_COLUMNS = ['trades', 'wins', 'losses', 'profit', 'equity', 'drawdown', 'max_drawdown', 'expectancy', 'streak']
+_COUNT_COLUMNS = {'trades', 'wins', 'losses', 'streak'}
+
+
+class EquityState:
+    """Running totals after the newest trade folded in, plus the bucket columns so far.
+
+    extend() continues from these totals, so trades appended in time order
+    never need the earlier history again.
+    """
+
+    def __init__(self, bucket, window):
+        import numpy as np
+
+        self.bucket = bucket
+        self.window = window
+        self.version = None
+        self.cursor = 0
+        self.max_id = 0
+        self.last_key = None
+        self.count = 0
+        self.total_profit = 0.0
+        self.equity = 0.0
+        self.peak = 0.0
+        self.max_drawdown = 0.0
+        self.streak = 0
+        self.max_win_streak = 0
+        self.max_loss_streak = 0
+        self.tail = np.empty(0)
+        self.periods = None
+        self.columns = {name: np.empty(0, dtype=int if name in _COUNT_COLUMNS else float) for name in BUCKET_COLUMNS}
+
+    def extend(self, timestamps, ids, profits):
+        """Fold in trades ordered by (timestamp, id), all newer than last_key"""
+        import numpy as np
+
+        n = len(profits)
+        if not n:
+            return
+        pl = np.asarray(profits, dtype=float)
+
+        # Equity starts at 0; drawdown is measured from the running peak
+        equity = self.equity + np.cumsum(pl)
+        peak = np.maximum.accumulate(np.concatenate(([self.peak], equity)))[1:]
+        drawdown = equity - peak
+        max_drawdown = np.minimum.accumulate(np.concatenate(([self.max_drawdown], drawdown)))[1:]
+
+        # Signed run length of wins (+) and losses (-); a break-even trade ends a run
+        sign = np.sign(pl).astype(int)
+        starts = np.flatnonzero(np.concatenate(([True], sign[1:] != sign[:-1])))
+        length = np.arange(n) - np.repeat(starts, np.diff(np.append(starts, n))) + 1
+        if sign[0] and np.sign(self.streak) == sign[0]:
+            first_run = starts[1] if len(starts) > 1 else n
+            length[:first_run] += abs(self.streak)
+        streak = sign * length
+
+        # Mean P/L of the last `window` trades, continuing from the kept tail
+        history = np.concatenate((self.tail, pl))
+        sums = np.concatenate(([0.0], np.cumsum(history)))
+        end = np.arange(len(self.tail), len(history)) + 1
+        start = np.maximum(end - self.window, 0)
+        expectancy = (sums[end] - sums[start]) / (end - start)
+
+        periods = period_starts(timestamps, BUCKETS[self.bucket])
+        first = np.flatnonzero(np.concatenate(([True], periods[1:] != periods[:-1])))
+        last = np.append(first[1:], n) - 1
+        new = {
+            'trades': np.diff(np.append(first, n)),
+            'wins': np.add.reduceat((pl > 0).astype(int), first),
+            'losses': np.add.reduceat((pl < 0).astype(int), first),
+            'profit': np.add.reduceat(pl, first),
+            'equity': equity[last],
+            'drawdown': np.minimum.reduceat(drawdown, first),
+            'max_drawdown': max_drawdown[last],
+            'expectancy': expectancy[last],
+            'streak': streak[last],
+        }
+        self._append_buckets(periods[first], new)
+
+        self.count += n
+        self.total_profit += float(pl.sum())
+        self.equity = float(equity[-1])
+        self.peak = float(peak[-1])
+        self.max_drawdown = float(max_drawdown[-1])
+        self.streak = int(streak[-1])
+        self.max_win_streak = max(self.max_win_streak, int(streak.max()))
+        self.max_loss_streak = max(self.max_loss_streak, int(-streak.min()))
+        self.tail = history[-self.window:]
+        self.last_key = (timestamps[-1], ids[-1])
+        self.max_id = max(self.max_id, int(max(ids)))
+
+    def _append_buckets(self, periods, new):
+        import numpy as np
+
+        if self.periods is not None and len(self.periods) and self.periods[-1] == periods[0]:
+            # The first new trades continue the last (partial) bucket
+            old = self.columns
+            for name in ('trades', 'wins', 'losses', 'profit'):
+                old[name][-1] += new[name][0]
+            old['drawdown'][-1] = min(old['drawdown'][-1], new['drawdown'][0])
+            for name in ('equity', 'max_drawdown', 'expectancy', 'streak'):
+                old[name][-1] = new[name][0]
+            periods = periods[1:]
+            new = {name: values[1:] for name, values in new.items()}
+
+        self.periods = periods if self.periods is None else np.concatenate((self.periods, periods))
+        for name in BUCKET_COLUMNS:
+            self.columns[name] = np.concatenate((self.columns[name], new[name]))
+
+    def bucket_columns(self):
+        periods = [] if self.periods is None else [str(period) for period in self.periods]
+        return {'periods': periods, **{name: values.tolist() for name, values in self.columns.items()}}
+
+    def to_dict(self):
+        return {
+            'bucket': self.bucket,
+            'window': self.window,
+            **self.bucket_columns(),
+            'summary': self.summary(),
+        }
+
+    def summary(self):
+        import numpy as np
+
+        profit = self.columns['profit']
+        sharpe = None
+        if len(profit) > 1 and profit.std(ddof=1) > 0:
+            sharpe = float(profit.mean() / profit.std(ddof=1) * np.sqrt(PERIODS_PER_YEAR[self.bucket]))
+        return {
+            'total_trades': self.count,
+            'total_profit': self.total_profit,
+            'expectancy': self.total_profit / self.count if self.count else 0.0,
+            'equity': self.equity,
+            'drawdown': self.equity - self.peak,
+            'max_drawdown': self.max_drawdown,
+            'current_streak': self.streak,
+            'max_win_streak': self.max_win_streak,
+            'max_loss_streak': self.max_loss_streak,
+            'sharpe': sharpe,
+        }
+
+
+class TimeseriesCache:
+    """EquityState per (bucket, window, filters), least recently used dropped first"""
+
+    def __init__(self, max_entries=MAX_STATES):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self._states = OrderedDict()
+
+    def get(self, key):
+        state = self._states.get(key)
+        if state is not None:
+            self._states.move_to_end(key)
+        return state
+
+    def put(self, key, state):
+        self._states[key] = state
+        self._states.move_to_end(key)
+        while len(self._states) > self.max_entries:
+            self._states.popitem(last=False)
+
+
+def _only_appends(state):
+    """True when every change since the state was built is a new trade"""
+    if cursor_expired(state.cursor):
+        return False
+    actions = db.session.scalars(
+        select(TradeChange.action).where(TradeChange.id > state.cursor).distinct()
+    ).all()
+    return set(actions) <= {'create'}
+
+
+def _trade_rows(criteria, after_id=0):
+    rows = db.session.execute(
+        select(Trade.timestamp, Trade.id, Trade.profit_loss)
+        .where(*criteria, Trade.id > after_id)
+        .order_by(Trade.timestamp, Trade.id)
+    ).all()
+    if not rows:
+        return [], [], []
+    timestamps, ids, profits = zip(*rows)
+    return timestamps, ids, [0.0 if pl is None else pl for pl in profits]
+
+
+def equity_timeseries(cache, args):
+    """The series for the request's bucket, window and filters (EquityState.to_dict).
+
+    A cached state at the current data version is returned as is. If the
+    change log shows only new trades since it was built, and they all sort
+    after its newest trade, they are folded in; anything else (edits,
+    deletes, backdated trades) rebuilds the state from the first trade.
+    """
+    bucket = args.get('bucket', 'day')
+    if bucket not in BUCKETS:
+        raise ValueError(f"Invalid bucket: {bucket}")
+    try:
+        window = int(args.get('window', DEFAULT_WINDOW))
+    except ValueError:
+        raise ValueError(f"Invalid window: {args.get('window')}")
+    if not 1 <= window <= MAX_WINDOW:
+        raise ValueError(f"Window must be between 1 and {MAX_WINDOW}")
+    criteria = trade_filters(args)
+    key = (bucket, window, tuple((name, tuple(args.getlist(name))) for name in FILTER_ARGS))
+
+    with cache.lock:
+        # Read the version and cursor before the trades, so writes racing
+        # with this request are looked at again next time
+        version = current_data_version()
+        state = cache.get(key)
+        if state is not None and state.version == version:
+            return state.to_dict()
+        cursor = latest_cursor()
+
+        timestamps = ids = profits = ()
+        if state is not None and _only_appends(state):
+            timestamps, ids, profits = _trade_rows(criteria, state.max_id)
+            if timestamps and state.last_key is not None and (timestamps[0], ids[0]) <= state.last_key:
+                state = None
+        else:
+            state = None
+
+        if state is None:
+            state = EquityState(bucket, window)
+            timestamps, ids, profits = _trade_rows(criteria)
+        state.extend(timestamps, ids, profits)
+        state.version = version
+        state.cursor = cursor
+        cache.put(key, state)
+        return state.to_dict()
+
+
+def register_timeseries_routes(app):
+    cache = TimeseriesCache()
+    app.extensions['timeseries'] = cache
+
+    # Equity, drawdown, streaks and rolling expectancy per day/week/month
+    # (?bucket=, ?window= trades for the rolling expectancy); accepts the
+    # /api/trades filters. ?format=columns|arrow sends the bucket columns only.
+    @app.route('/api/analytics/timeseries', methods=['GET'])
+    @versioned
+    def get_timeseries():
+        try:
+            fmt = columnar.wants_columns()
+            series = equity_timeseries(cache, request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        if fmt:
+            return columnar.columns_response({name: series[name] for name in ['periods', *BUCKET_COLUMNS]}, fmt)
+        return jsonify(series)
@@ -0,0 +1,86 @@
+from sqlalchemy import select, update
+from models import db, Trade
+from parsers import XSTATION5_TIME_FORMAT
+from datetime import datetime
+import re
+
+
+# Typed columns derived from a trade's free-form fields
+DERIVED_COLUMNS = ['duration_seconds', 'r_multiple', 'outcome']
+
+BACKFILL_BATCH_SIZE = 1000
+
+_DURATION_RE = re.compile(r'(-?\d+)\s*min')
+
+
+def parse_trade_time(value):
+    """ISO timestamps or xStation5 "dd.mm.yyyy HH:MM"; None when empty"""
+    if value is None or isinstance(value, datetime):
+        return value
+    value = str(value).strip()
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return datetime.strptime(value, XSTATION5_TIME_FORMAT)
+
+
+def parse_duration_minutes(duration):
+    match = _DURATION_RE.search(duration or '')
+    return int(match.group(1)) if match else None
+
+
+def outcome(profit_loss):
+    pl = profit_loss or 0.0
+    if pl > 0:
+        return 'win'
+    if pl < 0:
+        return 'loss'
+    return 'breakeven'
+
+
+def derived_values(profit_loss, risk, duration, open_time=None, close_time=None):
+    """Values for DERIVED_COLUMNS; open/close times win over the duration string"""
+    if open_time and close_time:
+        duration_seconds = int((close_time - open_time).total_seconds())
+    else:
+        minutes = parse_duration_minutes(duration)
+        duration_seconds = minutes * 60 if minutes is not None else None
+
+    return {
+        'duration_seconds': duration_seconds,
+        # Realised P/L in units of the planned risk
+        'r_multiple': profit_loss / risk if risk and profit_loss is not None and risk > 0 else None,
+        'outcome': outcome(profit_loss),
+    }
+
+
+def apply_derived(trade):
+    """Refresh the derived columns of a Trade after its fields changed"""
+    values = derived_values(trade.profit_loss, trade.risk, trade.duration, trade.open_time, trade.close_time)
+    for column, value in values.items():
+        setattr(trade, column, value)
+
+
+def backfill_derived():
+    """Fill the derived columns of every trade in id-ordered batches; returns the row count"""
+    count = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(Trade.id, Trade.profit_loss, Trade.risk, Trade.duration, Trade.open_time, Trade.close_time)
+            .where(Trade.id > last_id)
+            .order_by(Trade.id)
+            .limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        db.session.execute(update(Trade), [
+            {'id': row.id, **derived_values(row.profit_loss, row.risk, row.duration, row.open_time, row.close_time)}
+            for row in rows
+        ])
+        count += len(rows)
+        last_id = rows[-1].id
+    db.session.commit()
+    return count
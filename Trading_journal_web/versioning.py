@@ -0,0 +1,15 @@
+from sqlalchemy import select, update
+from models import db, DataVersion
+
+
+def bump_data_version():
+    """Increment the data version inside the caller's transaction"""
+    result = db.session.execute(
+        update(DataVersion).where(DataVersion.id == 1).values(version=DataVersion.version + 1)
+    )
+    if result.rowcount == 0:
+        db.session.add(DataVersion(id=1, version=1))
+
+
+def current_data_version():
+    return db.session.execute(select(DataVersion.version).where(DataVersion.id == 1)).scalar() or 0
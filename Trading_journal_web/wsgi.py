@@ -0,0 +1,11 @@
+"""WSGI entry point for production servers, e.g.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Importing this module only builds the app; the schema is created and upgraded
+by `flask --app app init-db`, run once per deploy before the workers start.
+"""
+from app import create_app
+
+
+app = create_app()